@@ -0,0 +1,65 @@
+"""Batched delivery pipeline for alerts sent to many subscribers.
+
+Recipients that share a message body are sent in bulk requests, bulk
+requests run concurrently over the pooled SMS session, and delivery
+results are written back in one transaction per batch.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from alert_log_store import insert_alert_logs
+from sms_gateway import send_bulk_sms
+
+# Subscribers read from the database per batch
+ALERT_BATCH_SIZE = int(os.environ.get('ALERT_BATCH_SIZE', '5000'))
+# Numbers per bulkV2 request
+SMS_BULK_SIZE = int(os.environ.get('SMS_BULK_SIZE', '500'))
+# Bulk requests in flight at once
+SMS_CONCURRENCY = int(os.environ.get('SMS_CONCURRENCY', '8'))
+
+
+def deliver(messages):
+    """Send each message to its recipients.
+
+    messages maps a message body to a list of (subscriber_id, mobile).
+    Returns a list of (subscriber_id, message, result) with one entry per
+    recipient, where result is the send_bulk_sms() result of its request.
+    """
+    requests_to_send = []
+    for message, recipients in messages.items():
+        for i in range(0, len(recipients), SMS_BULK_SIZE):
+            requests_to_send.append((message, recipients[i:i + SMS_BULK_SIZE]))
+
+    deliveries = []
+    if not requests_to_send:
+        return deliveries
+
+    with ThreadPoolExecutor(max_workers=min(SMS_CONCURRENCY, len(requests_to_send))) as executor:
+        futures = [
+            (message, recipients,
+             executor.submit(send_bulk_sms, [mobile for _, mobile in recipients], message))
+            for message, recipients in requests_to_send
+        ]
+        for message, recipients, future in futures:
+            result = future.result()
+            for sub_id, _ in recipients:
+                deliveries.append((sub_id, message, result))
+    return deliveries
+
+
+def record_deliveries(conn, alert_type, deliveries, update_last_alert_sent=True):
+    """Log every delivery and stamp successful recipients in one transaction"""
+    log_rows = []
+    sent_ids = []
+    for sub_id, message, result in deliveries:
+        if result['success']:
+            log_rows.append((sub_id, alert_type, message, 'sent', None))
+            sent_ids.append((sub_id,))
+        else:
+            log_rows.append((sub_id, alert_type, message, 'failed', result.get('error')))
+
+    with conn:
+        insert_alert_logs(conn, log_rows)
+        if update_last_alert_sent and sent_ids:
+            conn.executemany("UPDATE subscribers SET last_alert_sent = CURRENT_TIMESTAMP WHERE id = ?",
+                             sent_ids)
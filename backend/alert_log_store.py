@@ -0,0 +1,178 @@
+"""Writing, rolling up and archiving the alert_logs table.
+
+Message bodies are stored once in message_templates. Each log row points
+at its body with template_id and leaves message empty, so the thousands
+of identical scheduled alerts of a run share one copy of their text.
+Per-recipient details such as a name go in the row's params (a JSON
+object) and fill the body's $placeholders on read (db.render_message()),
+so personalized messages share one template too.
+
+Each row also records the subscriber's location when it was logged, so
+rollups don't depend on whether or where the subscriber still is.
+
+compact_alert_logs() keeps alert_logs bounded. It handles rows older than
+ALERT_LOG_RETENTION_DAYS (whole UTC days) in chunks of
+ALERT_LOG_COMPACT_BATCH. For each chunk it:
+
+* writes the rows, with their rendered message text, to a gzip NDJSON file in ALERT_LOG_ARCHIVE_DIR, recorded in alert_log_archives
+* adds the rows to the per-day, per-location, per-alert-type, per-status
+  counts in alert_log_daily
+* deletes them from alert_logs
+
+The last two happen in the same transaction as the archive record.
+Archive files are named by the id range they hold, so a chunk repeated
+after a crash overwrites its own file instead of duplicating it.
+Templates that no hot row references any more are then pruned.
+
+The scheduler leader runs it every ALERT_LOG_COMPACT_HOURS (see
+compact_if_due()); `python cli.py compact-alert-logs` runs it by hand.
+"""
+import gzip
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import metrics
+from db import get_db, select_in
+
+ALERT_LOG_RETENTION_DAYS = int(os.environ.get('ALERT_LOG_RETENTION_DAYS', '90'))
+ALERT_LOG_ARCHIVE_DIR = os.environ.get('ALERT_LOG_ARCHIVE_DIR', 'alert_log_archive')
+ALERT_LOG_COMPACT_BATCH = int(os.environ.get('ALERT_LOG_COMPACT_BATCH', '10000'))
+ALERT_LOG_COMPACT_HOURS = float(os.environ.get('ALERT_LOG_COMPACT_HOURS', '24'))
+
+# Rollup location for logs written before locations were recorded, whose
+# subscriber had already unsubscribed
+UNKNOWN_LOCATION = 'unknown'
+
+ARCHIVE_COLUMNS = ['id', 'subscriber_id', 'location', 'alert_type', 'message', 'sent_at',
+                   'status', 'error_message']
+
+archived_rows = metrics.counter(
+    'alert_logs_archived_total', "Alert log rows moved from alert_logs to archive files")
+
+# Monotonic time of this process's last compaction, for compact_if_due()
+_last_compaction = None
+
+
+def template_ids(conn, bodies):
+    """body -> message_templates id for every body, adding the new ones.
+
+    Call inside the transaction that writes the referencing rows, so a
+    concurrent prune can't remove a template between lookup and use.
+    """
+    bodies = list(bodies)
+    conn.executemany("INSERT OR IGNORE INTO message_templates (body) VALUES (?)", [(body,) for body in bodies])
+    return {body: template_id for template_id, body in
+            select_in(conn, 'SELECT id, body FROM message_templates WHERE body IN ({})', bodies)}
+
+
+def insert_alert_logs(conn, rows):
+    """Insert (subscriber_id, alert_type, message, status, error_message) rows.
+
+    A row may carry a sixth item, a dict of params for the $placeholders
+    in its message. Non-empty messages are stored as template references,
+    and the subscriber's current location is recorded with each row, so
+    log before deleting a subscriber. The caller commits.
+    """
+    rows = [tuple(row) + (None,) * (6 - len(row)) for row in rows]
+    ids = template_ids(conn, {row[2] for row in rows if row[2]})
+    conn.executemany("""INSERT INTO alert_logs
+                        (subscriber_id, location, alert_type, message, template_id, params, status, error_message)
+                        VALUES (?, (SELECT location FROM subscribers WHERE id = ?), ?, ?, ?, ?, ?, ?)""",
+                     [(sub_id, sub_id, alert_type, '' if message in ids else message, ids.get(message),
+                       json.dumps(params) if params else None, status, error)
+                      for sub_id, alert_type, message, status, error, params in rows])
+
+
+def _write_archive(archive_dir, rows):
+    """Write rows to a gzip NDJSON file named by their id range; returns its path"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"alert_logs-{rows[0][0]:012d}-{rows[-1][0]:012d}.ndjson.gz")
+    fd, tmp_path = tempfile.mkstemp(dir=archive_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as f:
+            for row in rows:
+                f.write((json.dumps(dict(zip(ARCHIVE_COLUMNS, row))) + '\n').encode())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def read_archive(path):
+    """Yield the rows of an archive file as dicts"""
+    with gzip.open(path, 'rt') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def compact_alert_logs(now=None, retention_days=None, batch_size=None, archive_dir=None):
+    """Archive, roll up and delete alert logs older than the retention window.
+
+    Returns a report with the cutoff, rows archived, archive files written
+    and templates pruned.
+    """
+    now = now or datetime.now(timezone.utc)
+    retention_days = ALERT_LOG_RETENTION_DAYS if retention_days is None else retention_days
+    batch_size = batch_size or ALERT_LOG_COMPACT_BATCH
+    archive_dir = archive_dir or ALERT_LOG_ARCHIVE_DIR
+    # Whole days only, so each day's rollup is complete once it is written
+    cutoff = (now - timedelta(days=retention_days)).strftime('%Y-%m-%d 00:00:00')
+    report = {'cutoff': cutoff, 'archived': 0, 'files': [], 'templates_pruned': 0}
+
+    start = time.perf_counter()
+    with get_db() as conn:
+        while True:
+            rows = conn.execute("""SELECT al.id, al.subscriber_id, al.location, al.alert_type,
+                                          COALESCE(render_message(mt.body, al.params), al.message),
+                                          al.sent_at, al.status, al.error_message
+                                   FROM alert_logs al
+                                   LEFT JOIN message_templates mt ON mt.id = al.template_id
+                                   WHERE al.sent_at < ?
+                                   ORDER BY al.id LIMIT ?""", (cutoff, batch_size)).fetchall()
+            if not rows:
+                break
+
+            path = _write_archive(archive_dir, rows)
+            counts = Counter((sent_at[:10], location or UNKNOWN_LOCATION, alert_type, status or 'unknown')
+                             for _, _, location, alert_type, _, sent_at, status, _ in rows)
+            with conn:
+                conn.executemany("""INSERT INTO alert_log_daily (day, location, alert_type, status, count)
+                                    VALUES (?, ?, ?, ?, ?)
+                                    ON CONFLICT (day, location, alert_type, status)
+                                    DO UPDATE SET count = count + excluded.count""",
+                                 [key + (count,) for key, count in counts.items()])
+                conn.execute("""INSERT INTO alert_log_archives
+                                (path, first_id, last_id, first_sent_at, last_sent_at, row_count)
+                                VALUES (?, ?, ?, ?, ?, ?)""",
+                             (path, rows[0][0], rows[-1][0], min(row[5] for row in rows),
+                              max(row[5] for row in rows), len(rows)))
+                conn.executemany("DELETE FROM alert_logs WHERE id = ?", [(row[0],) for row in rows])
+            archived_rows.inc(len(rows))
+            report['archived'] += len(rows)
+            report['files'].append(path)
+
+        with conn:
+            cursor = conn.execute("""DELETE FROM message_templates
+                                     WHERE NOT EXISTS (SELECT 1 FROM alert_logs
+                                                       WHERE alert_logs.template_id = message_templates.id)""")
+        report['templates_pruned'] = cursor.rowcount
+
+    report['seconds'] = round(time.perf_counter() - start, 4)
+    if report['archived']:
+        print(f"Archived {report['archived']} alert logs before {cutoff} into {len(report['files'])} files "
+              f"in {report['seconds']}s")
+    return report
+
+
+def compact_if_due():
+    """Run compact_alert_logs() if ALERT_LOG_COMPACT_HOURS passed since this process last did"""
+    global _last_compaction
+    if _last_compaction is not None and time.monotonic() - _last_compaction < ALERT_LOG_COMPACT_HOURS * 3600:
+        return None
+    _last_compaction = time.monotonic()
+    return compact_alert_logs()
@@ -0,0 +1,225 @@
+"""Durable scheduler for the daily, weekly and monthly subscriber alerts.
+
+Every run is a row in the alert_jobs table, so the schedule survives
+restarts:
+
+* due times are calendar based (every day, every Monday, the 1st of each
+  month, at ALERT_SEND_TIME local time); a run whose time passed while
+  the process was down is started on the next tick, as long as it is
+  less than ALERT_CATCHUP_HOURS old
+* each run is split into ALERT_SHARDS subscriber id ranges that are
+  sent in parallel; every shard records the last subscriber id it
+  finished, so after a crash it resumes from there instead of resending
+  to everyone (at most the batch in flight is sent again)
+* a shard whose owner stopped heartbeating for ALERT_JOB_STALE_SECONDS,
+  or that failed, is picked up again, up to ALERT_JOB_MAX_ATTEMPTS times
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import metrics
+from db import get_db
+
+ALERT_SEND_TIME = os.environ.get('ALERT_SEND_TIME', '09:00')
+ALERT_CATCHUP_HOURS = float(os.environ.get('ALERT_CATCHUP_HOURS', '24'))
+ALERT_SHARDS = int(os.environ.get('ALERT_SHARDS', '1'))
+ALERT_JOB_STALE_SECONDS = float(os.environ.get('ALERT_JOB_STALE_SECONDS', '300'))
+ALERT_JOB_MAX_ATTEMPTS = int(os.environ.get('ALERT_JOB_MAX_ATTEMPTS', '3'))
+# Seconds between checks for due or unfinished runs
+ALERT_POLL_SECONDS = float(os.environ.get('ALERT_POLL_SECONDS', '60'))
+
+FREQUENCIES = ['daily', 'weekly', 'monthly']
+
+SCHEDULED_FORMAT = '%Y-%m-%d %H:%M'
+
+job_seconds = metrics.histogram(
+    'scheduler_job_duration_seconds', "Scheduled job run time", ['job', 'outcome'])
+pending_shards = metrics.gauge(
+    'scheduler_pending_shards', "Alert job shards waiting to run or resume",
+    function=lambda: count_unfinished())
+
+
+def latest_due(frequency, now):
+    """Most recent scheduled time at or before now for frequency"""
+    hour, minute = (int(part) for part in ALERT_SEND_TIME.split(':'))
+    due = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if frequency == 'daily':
+        if due > now:
+            due -= timedelta(days=1)
+    elif frequency == 'weekly':
+        due -= timedelta(days=due.weekday())
+        if due > now:
+            due -= timedelta(days=7)
+    elif frequency == 'monthly':
+        due = due.replace(day=1)
+        if due > now:
+            previous = due - timedelta(days=1)
+            due = due.replace(year=previous.year, month=previous.month)
+    else:
+        raise ValueError(f"Unknown alert frequency: {frequency}")
+    return due
+
+
+def shard_ranges(min_id, max_id, shards):
+    """Split subscriber ids min_id..max_id into contiguous (after_id, until_id] ranges.
+
+    The last range is open-ended so subscribers who sign up while the run
+    is in progress are still included.
+    """
+    if min_id is None:
+        return [(0, None)]
+    shards = max(1, min(shards, max_id - min_id + 1))
+    step = (max_id - min_id + 1) / shards
+    bounds = [min_id - 1 + round(step * i) for i in range(shards + 1)]
+    bounds[0] = 0
+    return [(bounds[i], bounds[i + 1] if i + 1 < shards else None) for i in range(shards)]
+
+
+def create_due_jobs(now=None, shards=None):
+    """Insert the shards of every run that is due and not yet recorded"""
+    now = now or datetime.now()
+    shards = shards or ALERT_SHARDS
+    created = []
+    with get_db() as conn:
+        for frequency in FREQUENCIES:
+            due = latest_due(frequency, now)
+            if now - due > timedelta(hours=ALERT_CATCHUP_HOURS):
+                continue
+            scheduled_for = due.strftime(SCHEDULED_FORMAT)
+            exists = conn.execute("SELECT 1 FROM alert_jobs WHERE frequency = ? AND scheduled_for = ? LIMIT 1",
+                                  (frequency, scheduled_for)).fetchone()
+            if exists:
+                continue
+
+            min_id, max_id = conn.execute("""SELECT MIN(id), MAX(id) FROM subscribers
+                                             WHERE alert_frequency = ?""", (frequency,)).fetchone()
+            ranges = shard_ranges(min_id, max_id, shards)
+            with conn:
+                # OR IGNORE: another process may have created this run in the meantime
+                conn.executemany("""INSERT OR IGNORE INTO alert_jobs
+                                    (frequency, scheduled_for, shard, shard_count, after_id, until_id, last_id)
+                                    VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                                 [(frequency, scheduled_for, shard, len(ranges), after_id, until_id, after_id)
+                                  for shard, (after_id, until_id) in enumerate(ranges)])
+            created.append((frequency, scheduled_for, len(ranges)))
+            print(f"Scheduled {frequency} alerts for {scheduled_for} in {len(ranges)} shards")
+    return created
+
+
+def count_unfinished():
+    with get_db() as conn:
+        return conn.execute("""SELECT COUNT(*) FROM alert_jobs
+                               WHERE status IN ('pending', 'running')
+                               OR (status = 'failed' AND attempts < ?)""",
+                            (ALERT_JOB_MAX_ATTEMPTS,)).fetchone()[0]
+
+
+def _claimable_jobs(conn):
+    stale_before = time.time() - ALERT_JOB_STALE_SECONDS
+    return conn.execute("""SELECT id FROM alert_jobs
+                           WHERE status = 'pending'
+                           OR (status = 'running' AND heartbeat_at < ?)
+                           OR (status = 'failed' AND attempts < ?)
+                           ORDER BY scheduled_for, shard""",
+                        (stale_before, ALERT_JOB_MAX_ATTEMPTS)).fetchall()
+
+
+def _claim(conn, job_id):
+    """Mark a job as ours; returns False if another runner got it first"""
+    now = time.time()
+    with conn:
+        cursor = conn.execute("""UPDATE alert_jobs
+                                 SET status = 'running', heartbeat_at = ?, attempts = attempts + 1,
+                                     started_at = COALESCE(started_at, CURRENT_TIMESTAMP), error = NULL
+                                 WHERE id = ? AND (status = 'pending'
+                                                   OR (status = 'running' AND heartbeat_at < ?)
+                                                   OR (status = 'failed' AND attempts < ?))""",
+                              (now, job_id, now - ALERT_JOB_STALE_SECONDS, ALERT_JOB_MAX_ATTEMPTS))
+    return cursor.rowcount == 1
+
+
+class AlertJobScheduler:
+    """Runs alert_jobs rows with handler.
+
+    handler(frequency, as_of, after_id, until_id, on_batch) sends the
+    alerts for subscribers with after_id < id <= until_id (no upper bound
+    when until_id is None) and calls on_batch(last_id, count) after each
+    committed batch.
+
+    maintenance, if given, is called after every tick in run_forever()
+    and decides for itself whether it has work to do.
+    """
+    def __init__(self, handler, shards=ALERT_SHARDS, maintenance=None):
+        self._handler = handler
+        self._shards = shards
+        self._maintenance = maintenance
+
+    def tick(self, now=None):
+        """Create due runs and run every unfinished shard; returns shards run"""
+        create_due_jobs(now, self._shards)
+        with get_db() as conn:
+            job_ids = [row[0] for row in _claimable_jobs(conn)]
+        if not job_ids:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=max(1, self._shards)) as executor:
+            return sum(executor.map(self.run_shard, job_ids))
+
+    def run_shard(self, job_id):
+        """Run or resume one shard; returns 1 if this call ran it"""
+        with get_db() as conn:
+            if not _claim(conn, job_id):
+                return 0
+            frequency, scheduled_for, shard, shard_count, after_id, until_id, last_id = conn.execute(
+                """SELECT frequency, scheduled_for, shard, shard_count, after_id, until_id, last_id
+                   FROM alert_jobs WHERE id = ?""", (job_id,)).fetchone()
+
+        if last_id != after_id:
+            print(f"Resuming {frequency} alerts for {scheduled_for} "
+                  f"(shard {shard + 1}/{shard_count}) after subscriber {last_id}")
+
+        def checkpoint(batch_last_id, count):
+            with get_db() as conn:
+                with conn:
+                    conn.execute("""UPDATE alert_jobs
+                                    SET last_id = ?, processed = processed + ?, heartbeat_at = ?
+                                    WHERE id = ?""", (batch_last_id, count, time.time(), job_id))
+
+        start = time.perf_counter()
+        as_of = datetime.strptime(scheduled_for, SCHEDULED_FORMAT)
+        try:
+            self._handler(frequency, as_of, last_id, until_id, checkpoint)
+        except Exception as e:
+            print(f"{frequency} alerts for {scheduled_for} (shard {shard + 1}/{shard_count}) failed: {str(e)}")
+            status, error = 'failed', str(e)
+        else:
+            status, error = 'done', None
+        job_seconds.observe(time.perf_counter() - start, job=f'{frequency}_alerts',
+                            outcome='success' if status == 'done' else 'error')
+
+        with get_db() as conn:
+            with conn:
+                conn.execute("""UPDATE alert_jobs
+                                SET status = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+                                WHERE id = ?""", (status, error, job_id))
+        return 1
+
+    def run_forever(self, poll_seconds=ALERT_POLL_SECONDS):
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Alert scheduler tick failed: {str(e)}")
+            if self._maintenance:
+                start = time.perf_counter()
+                try:
+                    ran = self._maintenance()
+                except Exception as e:
+                    print(f"Scheduler maintenance failed: {str(e)}")
+                    job_seconds.observe(time.perf_counter() - start, job='maintenance', outcome='error')
+                else:
+                    if ran is not None:
+                        job_seconds.observe(time.perf_counter() - start, job='maintenance', outcome='success')
+            time.sleep(poll_seconds)
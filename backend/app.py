@@ -1,236 +1,451 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import pandas as pd
 import numpy as np
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
+import hashlib
+import io
 import json
 import sqlite3
+from db import get_db, migrate, render_message
 import os
 from werkzeug.security import generate_password_hash
-import requests  # For Fast2SMS API calls
-import schedule
+import tempfile
 import threading
 import time
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from model_store import MODEL_STORE_DIR, compute_store_key, load_models, save_models, selected_configs
+# pandas and the modelling modules (data_store, training, vectorized_hw,
+# climate_model) are imported inside the functions that load data or
+# train, so serving from a saved artifact (see load_serving()) starts fast
+from prediction_index import MONTH_MAPPING, PredictionIndex
+from spatial_index import inverse_distance_weights
+from snapshot import ModelSnapshot
+from sms_gateway import format_phone_number, send_sms
+from alert_delivery import ALERT_BATCH_SIZE, deliver, record_deliveries
+from outbreak_queue import OutbreakAlertQueue
+from alert_scheduler import AlertJobScheduler
+from alert_log_store import compact_if_due, insert_alert_logs
+from leader import LeaderLock
+import metrics
+from response_cache import LRUCache, cache_requests
+from pagination import MAX_PAGE_SIZE, STREAM_FORMATS, decode_cursor, encode_cursor, parse_page_size, stream_rows
+from subscriber_import import IMPORT_COLUMNS, import_subscribers, read_rows, validate_subscriber
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS to allow requests from React frontend
 
+request_seconds = metrics.histogram(
+    'http_request_duration_seconds', "Request latency by route", ['method', 'route', 'status'])
+model_fit_seconds = metrics.histogram(
+    'model_fit_duration_seconds', "Time to fit one location's model", ['status'])
+model_fit_last_seconds = metrics.gauge(
+    'model_fit_last_duration_seconds', "Duration of the latest fit per location", ['location'])
+alert_backlog = metrics.gauge(
+    'alert_backlog_subscribers', "Subscribers still to be processed by a running alert job", ['frequency'])
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        # Label by route pattern, not raw path, to keep the series count bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.observe(time.perf_counter() - start, method=request.method,
+                                route=route, status=response.status_code)
+    return response
+
 load_dotenv()
 
 # Fast2SMS configuration
 FAST2SMS_API_KEY = os.environ.get('FAST2SMS_API_KEY')
 FAST2SMS_SENDER_ID = os.environ.get('FAST2SMS_SENDER_ID', 'FSTSMS')  # Default sender ID
 
-# Check if all required environment variables are set
+# SMS sends fail without the key, but serving predictions doesn't need it
 if not FAST2SMS_API_KEY:
-    raise ValueError("Missing required Fast2SMS environment variables. Please check your .env file.")
+    print("FAST2SMS_API_KEY is not set; SMS alerts will fail until it is configured")
 else:
     print(f"Fast2SMS API Key loaded: {FAST2SMS_API_KEY[:10]}...") # Print first 10 chars for debugging
 
-# Global variables to store models and data
-models = {}
-forecasts = {}
-df = None
+# Data, models, forecasts and lookup index currently being served, as one
+# immutable ModelSnapshot; None until the first load
+snapshot = None
+# Held while building a new snapshot, so a cold start trains exactly once
+# and ingests can't interleave their swaps. Readers never take it.
+snapshot_lock = threading.Lock()
+
+# Each worker process serves its own snapshot, so get_snapshot() checks this
+# often whether another process changed the data file (0 checks every request)
+SNAPSHOT_CHECK_SECONDS = float(os.environ.get('SNAPSHOT_CHECK_SECONDS', '2'))
+# A reload waits this long for the ingesting process to store its models
+# before training its own
+SNAPSHOT_TRAIN_GRACE_SECONDS = float(os.environ.get('SNAPSHOT_TRAIN_GRACE_SECONDS', '60'))
+# Monotonic time of the next check, and of when a change was first seen
+# without stored models for it
+_next_snapshot_check = 0.0
+_change_seen_at = None
 
-# Database setup
-DB_NAME = 'dengue_subscribers.db'
+# Serialized responses, keyed by data version and request; cleared on every publish
+locations_cache = LRUCache('locations', maxsize=4)
+predict_cache = LRUCache('predict')
+heatmap_cache = LRUCache('heatmap', maxsize=256)
+
+DATA_FILE = 'dengue_cases_bangalore.csv'
+# Prediction index of the latest full load, for processes started with load_serving()
+SERVING_ARTIFACT = os.environ.get('SERVING_ARTIFACT', os.path.join(MODEL_STORE_DIR, 'serving.npz'))
+
+# Holt-Winters hyperparameters; part of the model store key, so changing
+# any of these invalidates cached models
+MODEL_CONFIG = {
+    'seasonal_periods': 12,
+    'trend': 'add',
+    'seasonal': 'add',
+    'initialization_method': 'estimated',
+    'use_boxcox': False,
+    'remove_bias': True,
+    'forecast_horizon': 36,
+    # Central coverage of the prediction intervals stored with the forecasts,
+    # and the simulated paths used to estimate them (statsmodels backend)
+    'interval_level': 0.9,
+    'interval_simulations': 500,
+    # Per-location model family: 'holt_winters', or 'climate' for the ridge
+    # regression on lagged Temperature, Rainfall, Precipitation and
+    # Mosquito_Density (normally chosen per location by select-models)
+    'model': 'holt_winters',
+    'climate_lags': [1, 2, 3],
+    'climate_ridge': 1.0,
+    # 'statsmodels' fits each location separately; 'vectorized' fits all
+    # locations together in NumPy (additive trend and seasonality only)
+    'backend': os.environ.get('FORECAST_BACKEND', 'statsmodels'),
+}
 
 def init_db():
-    """Initialize the subscribers database"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS subscribers
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  name TEXT NOT NULL,
-                  email TEXT UNIQUE NOT NULL,
-                  mobile TEXT NOT NULL,
-                  location TEXT NOT NULL,
-                  subscribed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  last_alert_sent TIMESTAMP,
-                  alert_frequency TEXT DEFAULT 'weekly')''')
-    
-    # Create alerts log table
-    c.execute('''CREATE TABLE IF NOT EXISTS alert_logs
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  subscriber_id INTEGER,
-                  alert_type TEXT NOT NULL,
-                  message TEXT NOT NULL,
-                  sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  status TEXT,
-                  error_message TEXT,
-                  FOREIGN KEY (subscriber_id) REFERENCES subscribers (id))''')
-    
-    conn.commit()
-    conn.close()
+    """Initialize the subscribers database and apply schema migrations"""
+    migrate()
 
 # Initialize database when the app starts
 init_db()
 
-# Load and prepare data
+def current_model_config():
+    """MODEL_CONFIG plus the per-location winners of the last offline model selection"""
+    selection = selected_configs()
+    return dict(MODEL_CONFIG, selection=selection) if selection else MODEL_CONFIG
+
+def file_stamp(path):
+    """(inode, size, mtime) of path, or None if it is missing"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+def build_snapshot(train=True):
+    """Load the data and its models, training only if none are cached (train=False returns None instead)"""
+    from data_store import load_frame
+    
+    # Taken before reading, so a write during the load still counts as a change
+    source = file_stamp(DATA_FILE)
+    # Memory-mapped columnar copy of the CSV, rebuilt only when the CSV changes
+    df, data_hash = load_frame(DATA_FILE)
+    config = current_model_config()
+    
+    # Reuse fitted models from the store when the data and config are unchanged
+    store_key = compute_store_key(DATA_FILE, config, data_hash=data_hash)
+    artifact = load_models(store_key)
+    cache_requests.inc(cache='model_store', result='miss' if artifact is None else 'hit')
+    if artifact is not None:
+        models, forecasts = artifact['params'], artifact['forecasts']
+        print(f"Loaded {len(models)} cached models ({store_key})")
+        if artifact['failed']:
+            print(f"{len(artifact['failed'])} locations failed to fit: {', '.join(artifact['failed'])}")
+    elif not train:
+        return None
+    else:
+        models, forecasts, report = train_models(df, config=config)
+        # Failures are cached too; they would fail again on the same data and config
+        save_models(store_key, config, models, forecasts, failed=report['failed'])
+    
+    return ModelSnapshot(df, models, forecasts, PredictionIndex.build(df, forecasts), store_key, config,
+                         source=source)
+
+def publish_snapshot(new_snapshot):
+    """Start serving new_snapshot; callers must hold snapshot_lock.
+    
+    Snapshots built from the full data also refresh the serving artifact.
+    """
+    global snapshot
+    snapshot = new_snapshot
+    for cache in (locations_cache, predict_cache, heatmap_cache):
+        cache.clear()
+    if new_snapshot.df is not None:
+        try:
+            new_snapshot.index.save(SERVING_ARTIFACT, new_snapshot.version)
+        except OSError as e:
+            print(f"Could not write serving artifact {SERVING_ARTIFACT}: {str(e)}")
+    return new_snapshot
+
 def load_data():
-    global df
-    df = pd.read_csv('dengue_cases_bangalore.csv')
+    """Load data and models from disk and publish them as the current snapshot"""
+    with snapshot_lock:
+        return publish_snapshot(build_snapshot())
+
+def load_serving():
+    """Serve from the saved prediction index, without loading data or models.
     
-    # Train models
-    train_models(df)
+    Takes milliseconds and imports no pandas or statsmodels. The snapshot
+    has no df, models or forecasts; an ingest loads the full data first.
+    Falls back to a full load when the artifact is missing or was built
+    from other data or model config.
+    """
+    with snapshot_lock:
+        return publish_snapshot(build_serving_snapshot())
+
+def build_serving_snapshot():
+    """Index-only snapshot from SERVING_ARTIFACT, or a full one if it is unusable or stale"""
+    from data_store import data_hash
     
-def train_models(df):
-    global models, forecasts
+    source = file_stamp(SERVING_ARTIFACT)
+    config = current_model_config()
+    try:
+        index, version = PredictionIndex.load(SERVING_ARTIFACT)
+        expected = compute_store_key(DATA_FILE, config, data_hash=data_hash(DATA_FILE))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"No usable serving artifact ({str(e)}), loading data and models")
+        return build_snapshot()
+    if version != expected:
+        print(f"Serving artifact {SERVING_ARTIFACT} is for {version}, but the data and config are now "
+              f"{expected}; loading data and models")
+        return build_snapshot()
+    print(f"Serving {len(index.locations)} locations from {SERVING_ARTIFACT} ({version})")
+    return ModelSnapshot(None, {}, {}, index, version, config, source=source)
+
+def get_snapshot():
+    """Return the snapshot being served, loading it on first use"""
+    current = snapshot
+    if current is not None:
+        if time.monotonic() < _next_snapshot_check:
+            return current
+        return reload_if_changed(current)
+    with snapshot_lock:
+        if snapshot is None:
+            publish_snapshot(build_snapshot())
+        return snapshot
+
+def reload_if_changed(current):
+    """Reload if the file current was read from changed on disk; returns the snapshot to serve"""
+    global _next_snapshot_check, _change_seen_at
+    _next_snapshot_check = time.monotonic() + SNAPSHOT_CHECK_SECONDS
+    path = SERVING_ARTIFACT if current.df is None else DATA_FILE
+    if file_stamp(path) == current.source or not snapshot_lock.acquire(blocking=False):
+        return current
+    try:
+        if snapshot is not current:
+            return snapshot
+        if current.df is None:
+            new_snapshot = build_serving_snapshot()
+        else:
+            if _change_seen_at is None:
+                _change_seen_at = time.monotonic()
+            # Models for the new data land in the store just after the data itself
+            train = time.monotonic() - _change_seen_at >= SNAPSHOT_TRAIN_GRACE_SECONDS
+            new_snapshot = build_snapshot(train=train)
+            if new_snapshot is None:
+                return current
+        print(f"{path} changed on disk, now serving {new_snapshot.version}")
+        _change_seen_at = None
+        return publish_snapshot(new_snapshot)
+    except Exception as e:
+        print(f"Could not reload changed {path}, still serving {current.version}: {str(e)}")
+        return current
+    finally:
+        snapshot_lock.release()
+
+def train_models(df, workers=None, backend=None, config=None):
+    """Fit every location in df; returns (models, forecasts, report).
     
-    month_mapping = {
-        'January': 1, 'February': 2, 'March': 3, 'April': 4,
-        'May': 5, 'June': 6, 'July': 7, 'August': 8,
-        'September': 9, 'October': 10, 'November': 11, 'December': 12
-    }
+    config defaults to MODEL_CONFIG and backend to config['backend'];
+    workers only applies to the per-location statsmodels backend. With
+    the vectorized backend, locations whose selected model it can't fit
+    (damped, multiplicative, Box-Cox, non-seasonal) go to statsmodels.
+    Locations whose model is 'climate' are fit together by train_climate().
+    """
+    from climate_model import prepare_frames, train_climate
+    from training import location_config, prepare_series, train_locations
+    from vectorized_hw import supports as vectorized_supports, train_vectorized
     
-    df = df.copy()
-    if df['Month'].dtype == object:
-        df['Month'] = df['Month'].map(month_mapping)
+    config = config or MODEL_CONFIG
+    backend = backend or config['backend']
+    series_by_location = prepare_series(df)
+    climate = {location: series for location, series in series_by_location.items()
+               if location_config(config, location)['model'] == 'climate'}
+    series_by_location = {location: series for location, series in series_by_location.items()
+                          if location not in climate}
+    if backend == 'vectorized':
+        vectorizable = {
+            location: series for location, series in series_by_location.items()
+            if vectorized_supports(location_config(config, location))
+        }
+        results = train_vectorized(vectorizable, config)
+        others = {location: series for location, series in series_by_location.items()
+                  if location not in vectorizable}
+        if others:
+            merge_training(results, train_locations(others, config, workers=workers))
+    elif backend == 'statsmodels':
+        results = train_locations(series_by_location, config, workers=workers)
+    else:
+        raise ValueError(f"Unknown forecasting backend: {backend}")
+    if climate:
+        merge_training(results, train_climate(prepare_frames(df, climate), config))
+    models, forecasts, report = results
+    print_training_report(report)
+    return models, forecasts, report
+
+def merge_training(results, other):
+    """Add another trainer's (models, forecasts, report) into results"""
+    models, forecasts, report = results
+    other_models, other_forecasts, other_report = other
+    models.update(other_models)
+    forecasts.update(other_forecasts)
+    report['locations'].update(other_report['locations'])
+    report['failed'] += other_report['failed']
+    report['total_seconds'] = round(report['total_seconds'] + other_report['total_seconds'], 4)
+
+def print_training_report(report):
+    for location, stats in report['locations'].items():
+        model_fit_seconds.observe(stats['fit_seconds'], status=stats['status'])
+        model_fit_last_seconds.set(stats['fit_seconds'], location=location)
+        if stats['status'] == 'failed':
+            print(f"Model fit failed for {location} after {stats['fit_seconds']}s: {stats['error']}")
+        else:
+            print(f"Model fit for {location} took {stats['fit_seconds']}s")
+        for warning in stats['warnings']:
+            print(f"Warning for {location}: {warning}")
+    ok = sum(1 for stats in report['locations'].values() if stats['status'] == 'ok')
+    print(f"Trained {ok}/{len(report['locations'])} locations "
+          f"in {report['total_seconds']}s using {report['workers']} workers")
+
+INGEST_REQUIRED_COLUMNS = ['Year', 'Month', 'Location', 'Cases']
+
+def ingest_observations(new_rows, refit=False):
+    """Merge new monthly observations and update only the affected locations.
     
-    df['Date'] = pd.to_datetime(df['Year'].astype(str) + '-' + df['Month'].astype(str), format='%Y-%m')
-    df.sort_values(['Location', 'Date'], inplace=True)
+    new_rows is a DataFrame with at least Year, Month, Location and Cases.
+    Rows for an existing (Year, Month, Location) replace the old value.
+    Known locations are re-forecast with their current parameters, or
+    refit from scratch when refit is True; new locations are always fit.
+    The CSV and data store are rewritten, then the updated data, models,
+    forecasts and lookup index are published as a new snapshot.
+    Locations that fail to fit are listed in the returned report.
+    """
+    import pandas as pd
+    from climate_model import prepare_frames, train_climate
+    from data_store import build_store
+    from training import fit_location, location_config, prepare_series, record_results, reforecast_location
     
-    locations = df['Location'].unique()
+    missing = [column for column in INGEST_REQUIRED_COLUMNS if column not in new_rows.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    if new_rows.empty:
+        raise ValueError("No rows to ingest")
     
-    for location in locations:
-        location_df = df[df['Location'] == location]
-        location_series = (location_df.set_index('Date')['Cases']
-                           .astype(float)
-                           .replace(0, np.nan)
-                           .bfill()
-                           .resample('ME')
-                           .mean()
-                           .interpolate(method='linear'))
+    new_rows = new_rows.copy()
+    if new_rows['Month'].dtype == object:
+        new_rows['Month'] = new_rows['Month'].map(lambda m: MONTH_MAPPING.get(m, m))
+    for column in ['Year', 'Month', 'Cases']:
+        new_rows[column] = pd.to_numeric(new_rows[column], errors='raise')
+    if not new_rows['Month'].between(1, 12).all():
+        raise ValueError("Month must be 1-12 or a month name")
+    if (new_rows['Cases'] < 0).any():
+        raise ValueError("Cases must be non-negative")
+    if new_rows['Location'].isna().any():
+        raise ValueError("Location is required for every row")
+    
+    with snapshot_lock:
+        # A snapshot from load_serving() has no data to add the rows to, and one
+        # read before another process's ingest would drop that process's rows
+        current = snapshot
+        if current is None or current.df is None or current.source != file_stamp(DATA_FILE):
+            current = build_snapshot()
+        df, models, config = current.df, current.models, dict(current.config)
+        
+        key_columns = ['Year', 'Month', 'Location']
+        # Columns the new rows don't carry stay empty after the concat
+        new_rows = new_rows.reindex(columns=df.columns).dropna(axis=1, how='all')
+        new_df = (pd.concat([df, new_rows], ignore_index=True)
+                  .drop_duplicates(subset=key_columns, keep='last')
+                  .sort_values(['Year', 'Month'], kind='stable')
+                  .reset_index(drop=True))
+        new_df[['Year', 'Month', 'Cases']] = new_df[['Year', 'Month', 'Cases']].astype(int)
+        new_df['MonthIndex'] = new_df['Year'] * 12 + new_df['Month'] - 1
         
-        if len(location_series) < 12:
-            print(f"Warning: Limited data points for {location}, accuracy may be low.")
+        affected = new_rows['Location'].unique().tolist()
+        series_by_location = prepare_series(new_df[new_df['Location'].isin(affected)])
         
-        model = ExponentialSmoothing(
-            location_series,
-            seasonal_periods=12,
-            trend='add',
-            seasonal='add',
-            initialization_method='estimated',
-            use_boxcox=False
-        )
-        fitted_model = model.fit(optimized=True, remove_bias=True)
+        start = time.perf_counter()
+        results = []
+        # The climate model is a closed-form solve, so it is always refit
+        climate = {location: series for location, series in series_by_location.items()
+                   if location_config(config, location)['model'] == 'climate'}
+        for location, location_series in series_by_location.items():
+            if location in climate:
+                continue
+            if location in models and not refit:
+                results.append(reforecast_location(location, location_series, models[location], config))
+            else:
+                results.append(fit_location(location, location_series, config))
+        
+        report = {'workers': 1, 'locations': {}, 'failed': [],
+                  'total_seconds': round(time.perf_counter() - start, 4)}
+        new_models = dict(models)
+        new_forecasts = dict(current.forecasts)
+        record_results(results, new_models, new_forecasts, report)
+        if climate:
+            merge_training((new_models, new_forecasts, report), train_climate(prepare_frames(new_df, climate), config))
+        print_training_report(report)
+        
+        # Persist so a restart picks up the same state without retraining
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(DATA_FILE)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', newline='') as f:
+                new_df.drop(columns=['MonthIndex']).to_csv(f, index=False)
+            os.replace(tmp_path, DATA_FILE)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        source = file_stamp(DATA_FILE)
+        manifest = build_store(DATA_FILE)
+        data_version = compute_store_key(DATA_FILE, config, data_hash=manifest['sha256'])
         
-        future_dates = pd.date_range(start=location_series.index[-1] + pd.DateOffset(months=1), periods=36, freq='ME')
-        future_forecast = fitted_model.forecast(steps=len(future_dates))
-        forecasts[location] = pd.DataFrame({'Predicted Cases': future_forecast}, index=future_dates)
-        models[location] = fitted_model
+        # Stored first, so other worker processes reload these models instead of training
+        save_models(data_version, config, new_models, new_forecasts, failed=report['failed'])
+        # Failed locations keep their previous model; their new actuals are still served
+        publish_snapshot(ModelSnapshot(new_df, new_models, new_forecasts,
+                                       PredictionIndex.build(new_df, new_forecasts), data_version, config,
+                                       source=source))
+        
+        return report
 
 def predict_cases(location, month, year):
     """Helper function to get prediction data internally"""
-    month_mapping = {
-        'January': 1, 'February': 2, 'March': 3, 'April': 4,
-        'May': 5, 'June': 6, 'July': 7, 'August': 8,
-        'September': 9, 'October': 10, 'November': 11, 'December': 12
-    }
-    
-    month_num = month_mapping.get(month)
+    month_num = MONTH_MAPPING.get(month)
     
     if not month_num:
         raise ValueError(f"Invalid month: {month}")
     
-    if location not in df['Location'].unique():
+    result = get_snapshot().index.lookup(location, int(year), month_num)
+    if result is None:
         raise ValueError(f"Location not found: {location}")
     
-    query_date = pd.Timestamp(year=year, month=month_num, day=1)
-    
-    # Check if we have actual data for this date
-    actual_data = df[(df['Location'] == location) & 
-                      (df['Year'] == year) & 
-                      (df['Month'] == month_num)]
-    
-    if not actual_data.empty:
-        prediction = int(actual_data['Cases'].iloc[0])
-        return {"prediction": prediction, "type": "actual"}
-    
-    # Otherwise, use forecast data
-    if location in forecasts:
-        # Find nearest date in forecast index
-        nearest_idx = forecasts[location].index.get_indexer([query_date], method='nearest')[0]
-        if nearest_idx >= 0:
-            prediction = int(forecasts[location].iloc[nearest_idx]['Predicted Cases'])
-            return {"prediction": prediction, "type": "forecast"}
-    
-    # If no forecast is available, return zero
-    return {"prediction": 0, "type": "error"}
-
-def format_phone_number(phone):
-    """Format phone number for Indian numbers"""
-    # Remove any non-numeric characters
-    phone = ''.join(filter(str.isdigit, phone))
-    
-    # Assuming Indian phone numbers
-    if phone.startswith('91'):
-        return phone[2:] if len(phone) > 2 else phone
-    elif len(phone) == 10:
-        return phone
-    else:
-        return phone[-10:] if len(phone) > 10 else phone
+    return result
 
-def send_sms(phone_number, message):
-    """Send SMS using Fast2SMS v3 API"""
-    try:
-        formatted_phone = format_phone_number(phone_number)
-        
-        # Fast2SMS v3 API endpoint
-        url = "https://www.fast2sms.com/dev/bulkV2"
-        
-        # Truncate message if it's too long (SMS limit is typically 160 characters)
-        if len(message) > 160:
-            message = message[:157] + "..."
-        
-        # v3 API parameters - authorization should be in headers
-        headers = {
-            "authorization": FAST2SMS_API_KEY,
-            "accept": "application/json",
-            "content-type": "application/x-www-form-urlencoded"
-        }
-        
-        # Payload for v3 API
-        payload = {
-            "route": "q",  # Quick SMS route
-            "message": message,
-            "flash": 0,
-            "numbers": formatted_phone
-        }
-        
-        response = requests.post(url, data=payload, headers=headers)
-        result = response.json()
-        
-        # Check if SMS was sent successfully
-        if result.get('return') == True:
-            print(f"SMS sent successfully to {formatted_phone}. Response: {result}")
-            return {'success': True, 'message_id': result.get('request_id', 'N/A')}
-        else:
-            print(f"Fast2SMS error: {result}")
-            error_message = result.get('message', 'Unknown error')
-            # More specific error handling
-            if result.get('status_code') == 412:
-                error_message = "Authentication failed. Please check your API key."
-            elif result.get('status_code') == 990:
-                error_message = "API configuration error. Please check Fast2SMS v3 documentation."
-            return {'success': False, 'error': error_message}
-            
-    except Exception as e:
-        print(f"Error sending SMS: {str(e)}")
-        return {'success': False, 'error': str(e)}
-
-def log_alert(subscriber_id, alert_type, message, status, error_message=None):
-    """Log alert history"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("""INSERT INTO alert_logs 
-                 (subscriber_id, alert_type, message, status, error_message) 
-                 VALUES (?, ?, ?, ?, ?)""",
-              (subscriber_id, alert_type, message, status, error_message))
-    conn.commit()
-    conn.close()
+def log_alert(subscriber_id, alert_type, message, status, error_message=None, params=None):
+    """Log alert history; params fill the $placeholders of a message template"""
+    with get_db() as conn:
+        insert_alert_logs(conn, [(subscriber_id, alert_type, message, status, error_message, params)])
+        conn.commit()
 
 def get_risk_level(cases):
     """Determine risk level based on case count"""
@@ -241,175 +456,486 @@ def get_risk_level(cases):
     else:
         return 'HIGH', 'Warning! High dengue cases in your area. Take precautions!'
 
-# Modified scheduler to handle different frequencies
-def send_alerts_by_frequency(frequency):
-    """Send alerts to subscribers based on their frequency preference"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+def compose_frequency_alert(frequency, location, cases):
+    """Compose the scheduled alert for a location (shorter for SMS limit)"""
+    risk_level, risk_message = get_risk_level(cases)
     
-    # Get subscribers with specific frequency
-    c.execute("SELECT id, name, mobile, location FROM subscribers WHERE alert_frequency = ?", (frequency,))
-    subscribers = c.fetchall()
+    message = f"DengueWatch {frequency} Alert!\n"
+    message += f"Location: {location}\n"
+    message += f"Cases: {cases}\n"
+    message += f"Risk: {risk_level}\n"
+    message += risk_message[:50] + "..." if len(risk_message) > 50 else risk_message
+    return message
+
+def send_alerts_by_frequency(frequency, as_of=None, after_id=0, until_id=None, on_batch=None):
+    """Send alerts to subscribers based on their frequency preference.
     
-    for subscriber in subscribers:
-        sub_id, name, mobile, location = subscriber
-        
-        # Get current prediction for subscriber's location
-        current_month = datetime.now().strftime('%B')
-        current_year = datetime.now().year
+    Subscribers are read in id order in batches of ALERT_BATCH_SIZE. Each
+    location's prediction and message is computed once per run, recipients
+    sharing a message are sent in bulk, and each batch's logs and
+    last_alert_sent updates are committed together.
+    
+    as_of (default now) picks the month predicted, so a resumed or late
+    run sends what was due. Only subscribers with after_id < id <= until_id
+    are covered; on_batch(last_id, count) is called after each batch is
+    recorded, which the scheduler uses to checkpoint progress.
+    """
+    alert_type = f'{frequency}_update'
+    as_of = as_of or datetime.now()
+    current_month = as_of.strftime('%B')
+    current_year = as_of.year
+    
+    # location -> message, or the exception raised while predicting it
+    location_messages = {}
+    last_id = after_id
+    id_filter = "AND id <= ?" if until_id is not None else ""
+    id_params = (until_id,) if until_id is not None else ()
+    
+    with get_db() as conn:
+        backlog = conn.execute(f"""SELECT COUNT(*) FROM subscribers
+                                    WHERE alert_frequency = ? AND id > ? {id_filter}""",
+                               (frequency, after_id) + id_params).fetchone()[0]
+    # Shards of one run share the gauge, so add and subtract rather than set
+    alert_backlog.inc(backlog, frequency=frequency)
+    
+    try:
+        while True:
+            # Get the next batch of subscribers with specific frequency
+            with get_db() as conn:
+                subscribers = conn.execute(f"""SELECT id, name, mobile, location FROM subscribers
+                                               WHERE alert_frequency = ? AND id > ? {id_filter}
+                                               ORDER BY id LIMIT ?""",
+                                           (frequency, last_id) + id_params + (ALERT_BATCH_SIZE,)).fetchall()
+            if not subscribers:
+                break
+            last_id = subscribers[-1][0]
+            backlog -= len(subscribers)
+            alert_backlog.dec(len(subscribers), frequency=frequency)
         
-        try:
-            # Get prediction
-            prediction_data = predict_cases(location, current_month, current_year)
-            cases = prediction_data.get('prediction', 0)
-            risk_level, risk_message = get_risk_level(cases)
+            messages = {}
+            errors = []
+            for sub_id, name, mobile, location in subscribers:
+                if location not in location_messages:
+                    try:
+                        prediction_data = predict_cases(location, current_month, current_year)
+                        location_messages[location] = compose_frequency_alert(
+                            frequency, location, prediction_data.get('prediction', 0))
+                    except Exception as e:
+                        print(f"Error preparing {frequency} alert for {location}: {str(e)}")
+                        location_messages[location] = e
             
-            # Compose message (shorter for SMS limit)
-            message = f"DengueWatch {frequency} Alert!\n"
-            message += f"Location: {location}\n"
-            message += f"Cases: {cases}\n"
-            message += f"Risk: {risk_level}\n"
-            message += risk_message[:50] + "..." if len(risk_message) > 50 else risk_message
-            
-            # Send SMS
-            result = send_sms(mobile, message)
-            
-            # Log the alert
-            status = 'sent' if result['success'] else 'failed'
-            error_msg = result.get('error') if not result['success'] else None
-            log_alert(sub_id, f'{frequency}_update', message, status, error_msg)
-            
-            # Update last alert sent timestamp
-            if result['success']:
-                c.execute("UPDATE subscribers SET last_alert_sent = CURRENT_TIMESTAMP WHERE id = ?", (sub_id,))
-                conn.commit()
-                
-        except Exception as e:
-            print(f"Error sending alert to {name}: {str(e)}")
-            log_alert(sub_id, f'{frequency}_update', '', 'error', str(e))
-    
-    conn.close()
+                message = location_messages[location]
+                if isinstance(message, Exception):
+                    errors.append((sub_id, alert_type, '', 'error', str(message)))
+                else:
+                    messages.setdefault(message, []).append((sub_id, mobile))
+        
+            deliveries = deliver(messages)
+            with get_db() as conn:
+                record_deliveries(conn, alert_type, deliveries)
+                if errors:
+                    with conn:
+                        insert_alert_logs(conn, errors)
+            if on_batch:
+                on_batch(last_id, len(subscribers))
+    finally:
+        # Whatever this run didn't reach (failures, or subscribers who
+        # changed frequency or unsubscribed mid-run) is no longer pending
+        alert_backlog.dec(max(backlog, 0), frequency=frequency)
 
 def send_outbreak_alert(location, cases):
     """Send immediate alert for disease outbreak"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+    # Compose urgent message (shorter for SMS limit)
+    message = "URGENT DengueWatch Alert!\n"
+    message += f"High outbreak in {location}!\n"
+    message += f"Cases: {cases}\n"
+    message += "Take precautions:\n"
+    message += "- Use repellent\n"
+    message += "- Remove water\n"
+    message += "- Seek help if ill"
     
     # Get subscribers in the affected location
-    c.execute("SELECT id, name, mobile FROM subscribers WHERE location = ?", (location,))
-    subscribers = c.fetchall()
-    
-    for subscriber in subscribers:
-        sub_id, name, mobile = subscriber
-        
-        # Compose urgent message (shorter for SMS limit)
-        message = f"URGENT DengueWatch Alert!\n"
-        message += f"High outbreak in {location}!\n"
-        message += f"Cases: {cases}\n"
-        message += "Take precautions:\n"
-        message += "- Use repellent\n"
-        message += "- Remove water\n"
-        message += "- Seek help if ill"
-        
-        # Send SMS
-        result = send_sms(mobile, message)
-        
-        # Log the alert
-        status = 'sent' if result['success'] else 'failed'
-        error_msg = result.get('error') if not result['success'] else None
-        log_alert(sub_id, 'outbreak_alert', message, status, error_msg)
+    with get_db() as conn:
+        subscribers = conn.execute("SELECT id, mobile FROM subscribers WHERE location = ?",
+                                   (location,)).fetchall()
     
-    conn.close()
+    deliveries = deliver({message: subscribers})
+    with get_db() as conn:
+        record_deliveries(conn, 'outbreak_alert', deliveries, update_last_alert_sent=False)
+
+# Outbreaks detected while serving predictions are sent from a background worker
+outbreak_alerts = OutbreakAlertQueue(send_outbreak_alert)
+metrics.gauge('outbreak_queue_depth', "Outbreak alerts waiting to be sent",
+              function=outbreak_alerts.depth)
+
+# Seconds between attempts by non-leader processes to take over the scheduler
+SCHEDULER_LEADER_RETRY = float(os.environ.get('SCHEDULER_LEADER_RETRY', '30'))
 
 def start_scheduler():
-    """Start background scheduler for periodic alerts"""
+    """Start background scheduler for periodic alerts; only the leader process (leader.py) runs them"""
     def run_scheduler():
-        # Schedule daily alerts every day at 9 AM
-        schedule.every().day.at("09:00").do(lambda: send_alerts_by_frequency('daily'))
-        
-        # Schedule weekly alerts every Monday at 9 AM
-        schedule.every().monday.at("09:00").do(lambda: send_alerts_by_frequency('weekly'))
+        leader_lock = LeaderLock()
+        while not leader_lock.try_acquire():
+            time.sleep(SCHEDULER_LEADER_RETRY)
+        print(f"Process {os.getpid()} is the alert scheduler leader")
         
-        # Schedule monthly alerts on the 1st of each month at 9 AM
-        schedule.every(30).days.at("09:00").do(lambda: send_alerts_by_frequency('monthly'))
-        
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
+        # Runs every unfinished shard, then checks for due runs every ALERT_POLL_SECONDS;
+        # old alert logs are archived and rolled up every ALERT_LOG_COMPACT_HOURS
+        AlertJobScheduler(send_alerts_by_frequency, maintenance=compact_if_due).run_forever()
     
     scheduler_thread = threading.Thread(target=run_scheduler)
     scheduler_thread.daemon = True
     scheduler_thread.start()
 
+def cached_json_response(body, etag):
+    """Serve a pre-serialized JSON body with revalidation headers.
+    
+    no-cache lets browsers and proxies store the response but makes them
+    revalidate, so a retrain is picked up immediately while unchanged
+    data costs only a 304.
+    """
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/api/locations', methods=['GET'])
 def get_locations():
-    global df
-    if df is None:
-        load_data()
-    locations = df['Location'].unique().tolist()
-    return jsonify({"locations": locations})
+    current = get_snapshot()
+    body = locations_cache.get(current.version, 'all')
+    if body is None:
+        body = app.json.dumps({"locations": current.index.locations})
+        locations_cache.put(current.version, 'all', body)
+    return cached_json_response(body, f"{current.version}-locations")
+
+# Years a prediction may be asked for
+MIN_YEAR, MAX_YEAR = 1900, 2200
 
-@app.route('/api/predict', methods=['POST'])
+@app.route('/api/predict', methods=['GET', 'POST'])
 def predict():
-    global df, forecasts
-    if df is None:
-        load_data()
-        
-    data = request.get_json()
+    """Prediction for one location and month.
+    
+    POST takes a JSON body; GET takes the same fields as query parameters,
+    which lets browsers and proxies cache the response.
+    """
+    current = get_snapshot()
+    data = request.args if request.method == 'GET' else (request.get_json() or {})
     location = data.get('location')
     month = data.get('month')
     year = data.get('year')
     
-    month_mapping = {
-        'January': 1, 'February': 2, 'March': 3, 'April': 4,
-        'May': 5, 'June': 6, 'July': 7, 'August': 8,
-        'September': 9, 'October': 10, 'November': 11, 'December': 12
-    }
-    
-    month_num = month_mapping.get(month)
+    month_num = MONTH_MAPPING.get(month)
     
     if not month_num:
         return jsonify({"error": "Invalid month"}), 400
     
-    if location not in df['Location'].unique():
-        return jsonify({"error": "Location not found"}), 404
-    
     try:
-        query_date = pd.Timestamp(year=year, month=month_num, day=1)
-        
-        # Check if we have actual data for this date
-        actual_data = df[(df['Location'] == location) & 
-                          (df['Year'] == year) & 
-                          (df['Month'] == month_num)]
+        year = int(year)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid year"}), 400
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        return jsonify({"error": f"Year must be between {MIN_YEAR} and {MAX_YEAR}"}), 400
+    
+    cache_key = (location, year, month_num)
+    cached = predict_cache.get(current.version, cache_key)
+    if cached is None:
+        if not current.index.has_location(location):
+            return jsonify({"error": "Location not found"}), 404
         
-        if not actual_data.empty:
-            prediction = int(actual_data['Cases'].iloc[0])
-            
-            # Check if this is an outbreak (>100 cases)
-            if prediction > 100:
-                send_outbreak_alert(location, prediction)
-            
-            return jsonify({"prediction": prediction, "type": "actual"})
+        try:
+            result = current.index.lookup(location, year, month_num)
+        except Exception as e:
+            print(f"Error generating prediction: {str(e)}")
+            return jsonify({"error": str(e)}), 500
         
-        # Otherwise, use forecast data
-        if location in forecasts:
-            # Find nearest date in forecast index
-            nearest_idx = forecasts[location].index.get_indexer([query_date], method='nearest')[0]
-            if nearest_idx >= 0:
-                prediction = int(forecasts[location].iloc[nearest_idx]['Predicted Cases'])
-                
-                # Check if this is an outbreak prediction
-                if prediction > 100:
-                    send_outbreak_alert(location, prediction)
-                
-                return jsonify({"prediction": prediction, "type": "forecast"})
+        if result['type'] == 'error':
+            return jsonify({"error": "Unable to generate prediction"}), 500
         
-        # If no forecast is available, return error
+        # Risk follows the point forecast, like /api/heatmap; the interval's
+        # upper bound is returned alongside for clients that want the worst case
+        result = dict(result, risk_level=get_risk_level(result['prediction'])[0])
+        if 'upper' in result:
+            result['interval_level'] = MODEL_CONFIG['interval_level']
+        cached = (result['prediction'], app.json.dumps(result))
+        predict_cache.put(current.version, cache_key, cached)
+    
+    # Check if this is an outbreak (>100 cases); alerts go out in the background.
+    # Checked on cache hits too; the queue drops repeats for the same month.
+    prediction, body = cached
+    if prediction > 100:
+        outbreak_alerts.enqueue(location, f"{year}-{month_num:02d}", prediction)
+    
+    digest = hashlib.sha1(repr(cache_key).encode()).hexdigest()[:16]
+    return cached_json_response(body, f"{current.version}-{digest}")
+
+# Most neighbouring wards one nearby request may blend
+MAX_NEARBY_WARDS = 10
+
+@app.route('/api/predict/nearby', methods=['GET', 'POST'])
+def predict_nearby():
+    """Prediction for a latitude/longitude from the nearest wards.
+    
+    Takes `lat`, `lon`, `month`, `year` and optional `k` (wards to use,
+    default 1). With k > 1 the wards' predictions and bounds are blended
+    by inverse squared distance unless `weighted` is false, in which case
+    the nearest ward's values are returned. Each ward used is listed with
+    its own prediction and distance.
+    """
+    index = get_snapshot().index
+    data = request.args if request.method == 'GET' else (request.get_json() or {})
+    
+    month_num = MONTH_MAPPING.get(data.get('month'))
+    if not month_num:
+        return jsonify({"error": "Invalid month"}), 400
+    try:
+        year = int(data.get('year'))
+        latitude = float(data.get('lat'))
+        longitude = float(data.get('lon'))
+        k = int(data.get('k', 1))
+    except (TypeError, ValueError):
+        return jsonify({"error": "lat, lon, year and k must be numbers"}), 400
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        return jsonify({"error": f"Year must be between {MIN_YEAR} and {MAX_YEAR}"}), 400
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return jsonify({"error": "Coordinates out of range"}), 400
+    if not 1 <= k <= MAX_NEARBY_WARDS:
+        return jsonify({"error": f"k must be between 1 and {MAX_NEARBY_WARDS}"}), 400
+    weighted = str(data.get('weighted', 'true')).lower() not in ('false', '0', 'no')
+    
+    nearest = index.wards.nearest(latitude, longitude, k)
+    if not nearest:
+        return jsonify({"error": "No locations with coordinates"}), 404
+    
+    wards = []
+    for location, distance in nearest:
+        result = index.lookup(location, year, month_num)
+        if result['type'] != 'error':
+            wards.append(dict(result, location=location, distance_km=round(distance, 3)))
+    if not wards:
         return jsonify({"error": "Unable to generate prediction"}), 500
+    
+    if weighted and len(wards) > 1:
+        weights = inverse_distance_weights([ward['distance_km'] for ward in wards])
+        result = {"prediction": int(round(float(np.dot(weights, [ward['prediction'] for ward in wards])))),
+                  "type": "weighted"}
+        if all('upper' in ward for ward in wards):
+            result['lower'] = int(round(float(np.dot(weights, [ward['lower'] for ward in wards]))))
+            result['upper'] = int(round(float(np.dot(weights, [ward['upper'] for ward in wards]))))
+        for ward, weight in zip(wards, weights):
+            ward['weight'] = round(float(weight), 4)
+    else:
+        result = {key: wards[0][key] for key in ('prediction', 'type', 'lower', 'upper') if key in wards[0]}
+    
+    result['risk_level'] = get_risk_level(result['prediction'])[0]
+    if 'upper' in result:
+        result['interval_level'] = MODEL_CONFIG['interval_level']
+    result['location'] = wards[0]['location']
+    result['wards'] = wards
+    return jsonify(result)
+
+# Upper bound on locations x months answered by one batch request
+MAX_BATCH_CELLS = 50000
+# Upper bound on locations named in one batch request
+MAX_BATCH_LOCATIONS = 1000
+
+def parse_period(value):
+    """Parse a 'YYYY-MM' string into (year, month)"""
+    year, month = str(value).split('-')
+    year, month = int(year), int(month)
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month in period: {value}")
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f"Year must be between {MIN_YEAR} and {MAX_YEAR}: {value}")
+    return year, month
+
+def month_range(start, end, limit):
+    """(year, month) pairs from start to end inclusive, at most limit of them"""
+    span = (end[0] - start[0]) * 12 + end[1] - start[1] + 1
+    if not 1 <= span <= limit:
+        raise ValueError(f"Range must cover 1 to {limit} months")
+    first = start[0] * 12 + start[1] - 1
+    return [(ordinal // 12, ordinal % 12 + 1) for ordinal in range(first, first + span)]
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """Predict many locations and months in one call.
+    
+    Accepts either `years` plus optional `months` (month names), or a
+    `start`/`end` range of 'YYYY-MM' periods. `locations`, a list of at
+    most MAX_BATCH_LOCATIONS names, defaults to all locations. The response is columnar: one row of predictions and types
+    per location, one column per period.
+    """
+    index = get_snapshot().index
+    data = request.get_json() or {}
+    locations = data.get('locations')
+    if locations is None:
+        locations = index.locations
+    elif not isinstance(locations, list) or not all(isinstance(location, str) for location in locations):
+        return jsonify({"error": "locations must be a list of location names"}), 400
+    elif len(locations) > MAX_BATCH_LOCATIONS:
+        return jsonify({"error": f"Too many locations, limit is {MAX_BATCH_LOCATIONS}"}), 400
+    elif not locations:
+        locations = index.locations
+    
+    unknown = [location for location in locations if not index.has_location(location)]
+    if unknown:
+        return jsonify({"error": "Location not found", "locations": unknown}), 404
+    
+    years = data.get('years')
+    if years is not None:
+        try:
+            if not isinstance(years, list):
+                raise TypeError
+            years = [int(year) for year in years]
+        except (TypeError, ValueError):
+            return jsonify({"error": "years must be a list of years"}), 400
+        out_of_range = [year for year in years if not MIN_YEAR <= year <= MAX_YEAR]
+        if out_of_range:
+            return jsonify({"error": f"Years must be between {MIN_YEAR} and {MAX_YEAR}",
+                            "years": out_of_range}), 400
+    month_names = data.get('months')
+    if month_names is not None:
+        if not isinstance(month_names, list) or not all(isinstance(month, str) for month in month_names):
+            return jsonify({"error": "months must be a list of month names"}), 400
+        unknown = [month for month in month_names if month not in MONTH_MAPPING]
+        if unknown:
+            return jsonify({"error": "Invalid month", "months": unknown}), 400
+    
+    try:
+        if 'start' in data or 'end' in data:
+            # Sized so the range alone can't exceed the cell limit
+            periods = month_range(parse_period(data['start']), parse_period(data['end']),
+                                  MAX_BATCH_CELLS // max(len(locations), 1))
+        elif years is None:
+            raise KeyError('years')
+        else:
+            month_nums = [MONTH_MAPPING[month] for month in month_names or MONTH_MAPPING]
+            periods = [(year, month) for year in years for month in month_nums]
+    except KeyError as e:
+        return jsonify({"error": f"Missing or invalid field: {str(e)}"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid period: {str(e)}"}), 400
+    
+    if not periods:
+        return jsonify({"error": "No periods requested"}), 400
+    if len(locations) * len(periods) > MAX_BATCH_CELLS:
+        return jsonify({"error": f"Batch too large, limit is {MAX_BATCH_CELLS} cells"}), 400
+    
+    predictions = []
+    types = []
+    lower = []
+    upper = []
+    for location in locations:
+        results = [index.lookup(location, year, month) for year, month in periods]
+        predictions.append([result['prediction'] for result in results])
+        types.append([result['type'] for result in results])
+        # Actuals have no interval; forecasts without one get null bounds
+        lower.append([result.get('lower') for result in results])
+        upper.append([result.get('upper') for result in results])
+    
+    return jsonify({
+        "locations": locations,
+        "periods": [f"{year}-{month:02d}" for year, month in periods],
+        "predictions": predictions,
+        "types": types,
+        "lower": lower,
+        "upper": upper,
+        "interval_level": MODEL_CONFIG['interval_level']
+    })
+
+@app.route('/api/ingest', methods=['POST'])
+def ingest():
+    """Ingest new monthly observations (admin).
+    
+    Accepts a JSON body {"rows": [...], "refit": false} or a text/csv body
+    with the same columns as dengue_cases_bangalore.csv (?refit=true).
+    """
+    import pandas as pd
+    
+    try:
+        if request.mimetype == 'text/csv':
+            new_rows = pd.read_csv(io.StringIO(request.get_data(as_text=True)))
+            refit = request.args.get('refit', 'false').lower() == 'true'
+        else:
+            data = request.get_json() or {}
+            new_rows = pd.DataFrame(data.get('rows') or [])
+            refit = bool(data.get('refit', False))
         
+        report = ingest_observations(new_rows, refit=refit)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(f"Error generating prediction: {str(e)}")
+        print(f"Error ingesting data: {str(e)}")
         return jsonify({"error": str(e)}), 500
+    
+    return jsonify({"success": not report['failed'], "report": report}), 200
+
+def build_heatmap(index, periods):
+    """Aggregate actual and forecast cases per location over periods"""
+    entries = []
+    for location in index.locations:
+        results = [index.lookup(location, year, month) for year, month in periods]
+        total = sum(result['prediction'] for result in results if result['type'] != 'error')
+        actual_months = sum(1 for result in results if result['type'] == 'actual')
+        forecast_months = sum(1 for result in results if result['type'] == 'forecast')
+        covered = actual_months + forecast_months
+        average = total / covered if covered else 0
+        latitude, longitude = index.coordinates.get(location, (None, None))
+        entries.append({
+            "location": location,
+            "latitude": latitude,
+            "longitude": longitude,
+            "total_cases": total,
+            "average_cases": round(average, 1),
+            "actual_months": actual_months,
+            "forecast_months": forecast_months,
+            "risk_level": get_risk_level(average)[0]
+        })
+    return entries
+
+# Longest ?start= / ?end= range one heatmap request may cover
+MAX_HEATMAP_MONTHS = 120
+
+@app.route('/api/heatmap', methods=['GET'])
+def get_heatmap():
+    """Per-location case totals with coordinates and risk level.
+    
+    Takes ?year= or a ?start= / ?end= range of 'YYYY-MM' periods and
+    covers both actual data and forecasts. Results are cached per data
+    version and served with an ETag, so unchanged maps revalidate with a
+    304 instead of being re-sent.
+    """
+    current = get_snapshot()
+    
+    try:
+        if request.args.get('year'):
+            start = parse_period(f"{int(request.args['year'])}-01")
+            end = (start[0], 12)
+        else:
+            start = parse_period(request.args['start'])
+            end = parse_period(request.args['end'])
+    except KeyError:
+        return jsonify({"error": "year or start and end are required"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid period: {str(e)}"}), 400
+    
+    try:
+        periods = month_range(start, end, MAX_HEATMAP_MONTHS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    version = current.version
+    body = heatmap_cache.get(version, (start, end))
+    if body is None:
+        body = app.json.dumps({
+            "version": version,
+            "start": f"{start[0]}-{start[1]:02d}",
+            "end": f"{end[0]}-{end[1]:02d}",
+            "locations": build_heatmap(current.index, periods)
+        })
+        heatmap_cache.put(version, (start, end), body)
+    
+    return cached_json_response(body, f"{version}-{start[0]}-{start[1]:02d}-{end[0]}-{end[1]:02d}")
 
 @app.route('/api/subscribe', methods=['POST'])
 def subscribe():
@@ -420,63 +946,50 @@ def subscribe():
     location = data.get('location')
     alert_frequency = data.get('alert_frequency', 'weekly')  # Default to weekly
     
-    # Validate required fields
-    if not all([name, email, mobile, location]):
-        return jsonify({"error": "All fields are required"}), 400
-    
-    # Validate email format
-    if '@' not in email:
-        return jsonify({"error": "Invalid email format"}), 400
-    
-    # Validate mobile number (basic validation)
-    if not mobile.isdigit() or len(mobile) < 10:
-        return jsonify({"error": "Invalid mobile number"}), 400
-    
-    # Validate alert frequency
-    valid_frequencies = ['daily', 'weekly', 'monthly']
-    if alert_frequency not in valid_frequencies:
-        return jsonify({"error": "Invalid alert frequency"}), 400
+    # Same rules as the bulk import
+    error = validate_subscriber(data)
+    if error:
+        return jsonify({"error": error}), 400
+    # Stored the same way as bulk imports
+    mobile = format_phone_number(mobile)
     
     try:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        
-        # Check if email already exists
-        c.execute("SELECT * FROM subscribers WHERE email = ?", (email,))
-        existing_user = c.fetchone()
-        
-        if existing_user:
-            conn.close()
-            return jsonify({
-                "success": False,
-                "message": "You are already subscribed!",
-                "already_subscribed": True
-            }), 200
-        
-        # Insert new subscriber
-        c.execute("""INSERT INTO subscribers 
-                    (name, email, mobile, location, alert_frequency) 
-                    VALUES (?, ?, ?, ?, ?)""",
-                 (name, email, mobile, location, alert_frequency))
-        conn.commit()
+        with get_db() as conn:
+            c = conn.cursor()
+            
+            # Check if email already exists
+            c.execute("SELECT 1 FROM subscribers WHERE email = ?", (email,))
+            existing_user = c.fetchone()
+            
+            if existing_user:
+                return jsonify({
+                    "success": False,
+                    "message": "You are already subscribed!",
+                    "already_subscribed": True
+                }), 200
+            
+            # Insert new subscriber
+            c.execute("""INSERT INTO subscribers 
+                        (name, email, mobile, location, alert_frequency) 
+                        VALUES (?, ?, ?, ?, ?)""",
+                     (name, email, mobile, location, alert_frequency))
+            subscriber_id = c.lastrowid
+            conn.commit()
         
-        # Welcome SMS (shorter for SMS limit)
-        welcome_message = f"Welcome to DengueWatch, {name}!\n"
-        welcome_message += f"You'll get {alert_frequency} alerts for {location}.\n"
-        welcome_message += "Stay safe! Reply STOP to unsubscribe."
+        # Welcome SMS (shorter for SMS limit); the subscriber's details are
+        # template params, so every welcome shares one logged template
+        welcome_template = "Welcome to DengueWatch, $name!\n"
+        welcome_template += "You'll get $alert_frequency alerts for $location.\n"
+        welcome_template += "Stay safe! Reply STOP to unsubscribe."
+        welcome_params = {'name': name, 'alert_frequency': alert_frequency, 'location': location}
         
-        # sms_result = send_sms(mobile, welcome_message)
+        # sms_result = send_sms(mobile, render_message(welcome_template, welcome_params))
         sms_result = {'success': True}
         
         # Log the welcome message
-        c.execute("SELECT id FROM subscribers WHERE email = ?", (email,))
-        subscriber_id = c.fetchone()[0]
-        
         status = 'sent' if sms_result['success'] else 'failed'
-        log_alert(subscriber_id, 'welcome', welcome_message, status, 
-                 sms_result.get('error') if not sms_result['success'] else None)
-        
-        conn.close()
+        log_alert(subscriber_id, 'welcome', welcome_template, status, 
+                 sms_result.get('error') if not sms_result['success'] else None, params=welcome_params)
         
         return jsonify({
             "success": True,
@@ -492,37 +1005,131 @@ def subscribe():
         print(f"Error during subscription: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def timestamp_filters(column, args, conditions, params):
+    """Add ?since= / ?until= bounds on a TIMESTAMP column"""
+    # Timestamps are stored as 'YYYY-MM-DD HH:MM:SS' text, so ISO input needs a space
+    if args.get('since'):
+        conditions.append(f"{column} >= ?")
+        params.append(args['since'].replace('T', ' '))
+    if args.get('until'):
+        conditions.append(f"{column} < ?")
+        params.append(args['until'].replace('T', ' '))
+
+SUBSCRIBER_COLUMNS = ['id', 'name', 'email', 'location', 'subscribed_at',
+                      'last_alert_sent', 'alert_frequency']
+
 @app.route('/api/subscribers', methods=['GET'])
 def get_subscribers():
-    """Get all subscribers (for admin purposes)"""
+    """Get subscribers (for admin purposes).
+    
+    Results are paged by id: pass ?limit= and the previous page's
+    next_cursor as ?cursor=. Filters: ?location=, ?frequency=, and
+    ?since= / ?until= on subscribed_at. ?format=ndjson or ?format=csv
+    streams every matching row instead of returning a page.
+    """
+    args = request.args
+    conditions = []
+    params = []
+    if args.get('location'):
+        conditions.append("location = ?")
+        params.append(args['location'])
+    if args.get('frequency'):
+        conditions.append("alert_frequency = ?")
+        params.append(args['frequency'])
+    timestamp_filters('subscribed_at', args, conditions, params)
+    
+    fmt = args.get('format', 'json')
+    if fmt in STREAM_FORMATS:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        query = f"SELECT {', '.join(SUBSCRIBER_COLUMNS)} FROM subscribers {where} ORDER BY id"
+        return stream_rows(query, params, SUBSCRIBER_COLUMNS, fmt, 'subscribers')
+    if fmt != 'json':
+        return jsonify({"error": "Invalid format"}), 400
+    
     try:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        c.execute("""SELECT id, name, email, location, subscribed_at, 
-                           last_alert_sent, alert_frequency 
-                    FROM subscribers""")
-        subscribers = c.fetchall()
-        conn.close()
+        limit = parse_page_size(args.get('limit'))
+        if args.get('cursor'):
+            conditions.append("id > ?")
+            params.append(int(decode_cursor(args['cursor'])))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with get_db() as conn:
+            # One extra row tells us whether there is another page
+            subscribers = conn.execute(f"""SELECT {', '.join(SUBSCRIBER_COLUMNS)}
+                                           FROM subscribers {where}
+                                           ORDER BY id LIMIT ?""", params + [limit + 1]).fetchall()
+        
+        next_cursor = None
+        if len(subscribers) > limit:
+            subscribers = subscribers[:limit]
+            next_cursor = encode_cursor(subscribers[-1][0])
         
         return jsonify({
-            "subscribers": [
-                {
-                    "id": sub[0],
-                    "name": sub[1],
-                    "email": sub[2],
-                    "location": sub[3],
-                    "subscribed_at": sub[4],
-                    "last_alert_sent": sub[5],
-                    "alert_frequency": sub[6]
-                }
-                for sub in subscribers
-            ]
+            "subscribers": [dict(zip(SUBSCRIBER_COLUMNS, sub)) for sub in subscribers],
+            "next_cursor": next_cursor
         }), 200
         
     except Exception as e:
         print(f"Error fetching subscribers: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# Content types accepted by the bulk import, besides ?format=
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+}
+
+@app.route('/api/subscribers/import', methods=['POST'])
+def import_subscribers_route():
+    """Bulk upsert subscribers from a CSV or NDJSON request body.
+    
+    The format comes from ?format= or the Content-Type. The body is read
+    row by row; the response reports counts and per-row errors.
+    ?dry_run=true only validates.
+    """
+    fmt = request.args.get('format') or IMPORT_CONTENT_TYPES.get(request.mimetype)
+    if fmt not in STREAM_FORMATS:
+        return jsonify({"error": "Send CSV or NDJSON (set Content-Type or ?format=csv|ndjson)"}), 400
+    dry_run = request.args.get('dry_run', '').lower() in ('true', '1', 'yes')
+    
+    try:
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+        report = import_subscribers(read_rows(lines, fmt), dry_run=dry_run)
+    except UnicodeDecodeError:
+        return jsonify({"error": "Body must be UTF-8"}), 400
+    except sqlite3.Error as e:
+        print(f"Database error during import: {str(e)}")
+        return jsonify({"error": "Database error occurred"}), 500
+    
+    print(f"Imported subscribers: {report['inserted']} new, {report['updated']} updated, "
+          f"{report['failed']} rejected")
+    return jsonify(dict(report, dry_run=dry_run)), 200
+
+@app.route('/api/subscribers/export', methods=['GET'])
+def export_subscribers():
+    """Stream subscribers in the import format (?format=csv, the default, or ndjson).
+    
+    Takes the same ?location= and ?frequency= filters as /api/subscribers.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in STREAM_FORMATS:
+        return jsonify({"error": "Invalid format"}), 400
+    conditions = []
+    params = []
+    if request.args.get('location'):
+        conditions.append("location = ?")
+        params.append(request.args['location'])
+    if request.args.get('frequency'):
+        conditions.append("alert_frequency = ?")
+        params.append(request.args['frequency'])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    query = f"SELECT {', '.join(IMPORT_COLUMNS)} FROM subscribers {where} ORDER BY id"
+    return stream_rows(query, params, IMPORT_COLUMNS, fmt, 'subscribers')
+
 @app.route('/api/update-preferences', methods=['POST'])
 def update_preferences():
     data = request.get_json()
@@ -537,58 +1144,162 @@ def update_preferences():
         return jsonify({"error": "Invalid alert frequency"}), 400
     
     try:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        
-        c.execute("UPDATE subscribers SET alert_frequency = ? WHERE email = ?", (frequency, email))
-        
-        if c.rowcount > 0:
-            conn.commit()
-            conn.close()
-            return jsonify({"success": True, "message": "Preferences updated successfully"}), 200
-        else:
-            conn.close()
-            return jsonify({"error": "Email not found"}), 404
+        with get_db() as conn:
+            c = conn.execute("UPDATE subscribers SET alert_frequency = ? WHERE email = ?", (frequency, email))
+            
+            if c.rowcount > 0:
+                conn.commit()
+                return jsonify({"success": True, "message": "Preferences updated successfully"}), 200
+            else:
+                return jsonify({"error": "Email not found"}), 404
             
     except Exception as e:
         print(f"Error updating preferences: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+ALERT_LOG_COLUMNS = ['id', 'subscriber_id', 'alert_type', 'message', 'sent_at', 'status',
+                     'error_message', 'subscriber_name', 'subscriber_email']
+
 @app.route('/api/alert-logs', methods=['GET'])
 def get_alert_logs():
-    """Get alert history for monitoring"""
+    """Get alert history for monitoring, newest first.
+    
+    Results are paged by (sent_at, id): pass ?limit= and the previous
+    page's next_cursor as ?cursor=. Filters: ?location= the alert was sent
+    for, ?frequency= of the subscriber, ?status=, ?alert_type=, and ?since=
+    / ?until= on sent_at. ?format=ndjson or ?format=csv streams every
+    matching row.
+    """
+    args = request.args
+    conditions = []
+    params = []
+    if args.get('location'):
+        conditions.append("al.location = ?")
+        params.append(args['location'])
+    if args.get('frequency'):
+        conditions.append("s.alert_frequency = ?")
+        params.append(args['frequency'])
+    if args.get('status'):
+        conditions.append("al.status = ?")
+        params.append(args['status'])
+    if args.get('alert_type'):
+        conditions.append("al.alert_type = ?")
+        params.append(args['alert_type'])
+    timestamp_filters('al.sent_at', args, conditions, params)
+    
+    select = """SELECT al.id, al.subscriber_id, al.alert_type,
+                       COALESCE(render_message(mt.body, al.params), al.message), al.sent_at,
+                       al.status, al.error_message, s.name, s.email
+                FROM alert_logs al
+                LEFT JOIN subscribers s ON al.subscriber_id = s.id
+                LEFT JOIN message_templates mt ON al.template_id = mt.id"""
+    
+    fmt = args.get('format', 'json')
+    if fmt in STREAM_FORMATS:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        query = f"{select} {where} ORDER BY al.sent_at DESC, al.id DESC"
+        return stream_rows(query, params, ALERT_LOG_COLUMNS, fmt, 'alert_logs')
+    if fmt != 'json':
+        return jsonify({"error": "Invalid format"}), 400
+    
     try:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        c.execute("""SELECT al.*, s.name, s.email 
-                    FROM alert_logs al
-                    JOIN subscribers s ON al.subscriber_id = s.id
-                    ORDER BY al.sent_at DESC
-                    LIMIT 100""")
-        logs = c.fetchall()
-        conn.close()
+        limit = parse_page_size(args.get('limit'))
+        if args.get('cursor'):
+            sent_at, log_id = decode_cursor(args['cursor'])
+            conditions.append("(al.sent_at, al.id) < (?, ?)")
+            params.extend([sent_at, int(log_id)])
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with get_db() as conn:
+            # One extra row tells us whether there is another page
+            logs = conn.execute(f"""{select} {where}
+                                    ORDER BY al.sent_at DESC, al.id DESC
+                                    LIMIT ?""", params + [limit + 1]).fetchall()
+        
+        next_cursor = None
+        if len(logs) > limit:
+            logs = logs[:limit]
+            next_cursor = encode_cursor([logs[-1][4], logs[-1][0]])
         
         return jsonify({
-            "logs": [
-                {
-                    "id": log[0],
-                    "subscriber_id": log[1],
-                    "alert_type": log[2],
-                    "message": log[3],
-                    "sent_at": log[4],
-                    "status": log[5],
-                    "error_message": log[6],
-                    "subscriber_name": log[7],
-                    "subscriber_email": log[8]
-                }
-                for log in logs
-            ]
+            "logs": [dict(zip(ALERT_LOG_COLUMNS, log)) for log in logs],
+            "next_cursor": next_cursor
         }), 200
         
     except Exception as e:
         print(f"Error fetching alert logs: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+ALERT_LOG_DAILY_COLUMNS = ['day', 'location', 'alert_type', 'status', 'count']
+
+@app.route('/api/alert-logs/daily', methods=['GET'])
+def get_alert_log_daily():
+    """Per-day alert counts for logs compacted out of alert_logs.
+    
+    Filters: ?location=, ?alert_type=, ?status=, and ?since= / ?until=
+    on the day ('YYYY-MM-DD'). Recent days still in alert_logs are not
+    included until they pass the retention window.
+    """
+    args = request.args
+    conditions = []
+    params = []
+    for column in ('location', 'alert_type', 'status'):
+        if args.get(column):
+            conditions.append(f"{column} = ?")
+            params.append(args[column])
+    if args.get('since'):
+        conditions.append("day >= ?")
+        params.append(args['since'])
+    if args.get('until'):
+        conditions.append("day < ?")
+        params.append(args['until'])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
+    fmt = args.get('format', 'json')
+    query = f"""SELECT {', '.join(ALERT_LOG_DAILY_COLUMNS)} FROM alert_log_daily {where}
+                ORDER BY day DESC, location, alert_type, status"""
+    if fmt in STREAM_FORMATS:
+        return stream_rows(query, params, ALERT_LOG_DAILY_COLUMNS, fmt, 'alert_log_daily')
+    if fmt != 'json':
+        return jsonify({"error": "Invalid format"}), 400
+    
+    with get_db() as conn:
+        rows = conn.execute(f"{query} LIMIT ?", params + [MAX_PAGE_SIZE]).fetchall()
+    return jsonify({"days": [dict(zip(ALERT_LOG_DAILY_COLUMNS, row)) for row in rows],
+                    "truncated": len(rows) == MAX_PAGE_SIZE}), 200
+
+ALERT_LOG_ARCHIVE_COLUMNS = ['id', 'path', 'first_id', 'last_id', 'first_sent_at', 'last_sent_at',
+                             'row_count', 'created_at']
+
+@app.route('/api/alert-logs/archives', methods=['GET'])
+def get_alert_log_archives():
+    """Archive files holding compacted alert logs, newest first.
+    
+    ?since= / ?until= select files whose rows overlap that sent_at range.
+    Each file is gzip NDJSON with the message text and location inlined.
+    """
+    conditions = []
+    params = []
+    if request.args.get('since'):
+        conditions.append("last_sent_at >= ?")
+        params.append(request.args['since'].replace('T', ' '))
+    if request.args.get('until'):
+        conditions.append("first_sent_at < ?")
+        params.append(request.args['until'].replace('T', ' '))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    with get_db() as conn:
+        rows = conn.execute(f"""SELECT {', '.join(ALERT_LOG_ARCHIVE_COLUMNS)} FROM alert_log_archives {where}
+                                ORDER BY id DESC""", params).fetchall()
+    return jsonify({"archives": [dict(zip(ALERT_LOG_ARCHIVE_COLUMNS, row)) for row in rows]}), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/api/send-test-sms', methods=['POST'])
 def send_test_sms():
     """Send test SMS to verify Fast2SMS configuration"""
@@ -615,33 +1326,32 @@ def unsubscribe():
         return jsonify({"error": "Email required"}), 400
     
     try:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        
         # First get subscriber details for sending goodbye SMS
-        c.execute("SELECT id, name, mobile FROM subscribers WHERE email = ?", (email,))
-        subscriber = c.fetchone()
+        with get_db() as conn:
+            subscriber = conn.execute("SELECT id, name, mobile FROM subscribers WHERE email = ?",
+                                      (email,)).fetchone()
         
         if subscriber:
             sub_id, name, mobile = subscriber
             
-            # Send goodbye SMS (shorter for SMS limit)
-            goodbye_message = f"Goodbye {name}!\n"
-            goodbye_message += "You've been unsubscribed from DengueWatch.\n"
-            goodbye_message += "To resubscribe, visit our website.\n"
-            goodbye_message += "Stay safe!"
+            # Send goodbye SMS (shorter for SMS limit); the name is a template param
+            goodbye_template = "Goodbye $name!\n"
+            goodbye_template += "You've been unsubscribed from DengueWatch.\n"
+            goodbye_template += "To resubscribe, visit our website.\n"
+            goodbye_template += "Stay safe!"
+            goodbye_params = {'name': name}
             
-            sms_result = send_sms(mobile, goodbye_message)
+            sms_result = send_sms(mobile, render_message(goodbye_template, goodbye_params))
             
-            # Log the goodbye message
+            # Log the goodbye message, before the subscriber row and its location go
             status = 'sent' if sms_result['success'] else 'failed'
-            log_alert(sub_id, 'goodbye', goodbye_message, status, 
-                     sms_result.get('error') if not sms_result['success'] else None)
+            log_alert(sub_id, 'goodbye', goodbye_template, status, 
+                     sms_result.get('error') if not sms_result['success'] else None, params=goodbye_params)
             
             # Now delete the subscriber
-            c.execute("DELETE FROM subscribers WHERE email = ?", (email,))
-            conn.commit()
-            conn.close()
+            with get_db() as conn:
+                conn.execute("DELETE FROM subscribers WHERE email = ?", (email,))
+                conn.commit()
             
             return jsonify({
                 "success": True, 
@@ -649,7 +1359,6 @@ def unsubscribe():
                 "sms_sent": sms_result['success']
             }), 200
         else:
-            conn.close()
             return jsonify({"error": "Email not found"}), 404
             
     except Exception as e:
@@ -0,0 +1,8 @@
+"""Performance benchmarks for the training, prediction and alerting paths.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --output results.json
+
+See benchmarks/run.py for the available options.
+"""
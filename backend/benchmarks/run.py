@@ -0,0 +1,365 @@
+"""Benchmark training, /api/predict and scheduled alert delivery.
+
+Everything runs against synthetic data in a throwaway directory, with
+its own SQLite database, model store and a local stub Fast2SMS server,
+so results don't depend on (or touch) the real data or send real SMS.
+The parity check is the exception: it reads the bundled case CSV (without
+changing it) and compares the vectorized backend's forecasts with
+statsmodels'.
+
+    python -m benchmarks.run                      # full suite
+    python -m benchmarks.run --quick              # small sizes, for CI
+    python -m benchmarks.run --only train --train-sizes 10 100
+    python -m benchmarks.run --output new.json --baseline old.json
+
+Results are written as JSON (stdout unless --output is given). With
+--baseline, each result is compared with the matching one in an earlier
+run and the exit status is 1 if any got slower by more than --tolerance.
+The exit status is also 1 if the parity check fails.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.stub_sms import StubSMSServer
+from benchmarks.synthetic import insert_subscribers, make_cases
+
+BENCHMARKS = ['train', 'parity', 'predict', 'alerts']
+
+DEFAULT_SIZES = {
+    'train': [10, 100, 1000],
+    'alerts': [10000, 100000, 1000000],
+}
+QUICK_SIZES = {
+    'train': [10, 50],
+    'alerts': [10000],
+}
+
+# Metric compared against the baseline for each benchmark; lower is better
+REGRESSION_METRICS = {
+    'train': 'seconds',
+    'parity': 'max_relative_diff',
+    'predict': 'p95_ms',
+    'alerts': 'seconds',
+}
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    """Swallow the app's per-location and per-SMS prints while timing"""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def percentile_ms(seconds, q):
+    return round(float(np.percentile(seconds, q)) * 1000, 3)
+
+
+def bench_train(app, sizes, backends, workers, verbose):
+    results = []
+    for backend in backends:
+        for n_locations in sizes:
+            df = make_cases(n_locations)
+            log(f"train: {backend}, {n_locations} locations")
+            start = time.perf_counter()
+            with quiet(not verbose):
+                models, _, report = app.train_models(df, workers=workers, backend=backend)
+            seconds = time.perf_counter() - start
+            results.append({
+                'benchmark': 'train',
+                'params': {'backend': backend, 'locations': n_locations, 'workers': report['workers']},
+                'metrics': {
+                    'seconds': round(seconds, 4),
+                    'locations_per_second': round(n_locations / seconds, 2),
+                    'failed': len(report['failed']),
+                },
+            })
+    return results
+
+
+def bench_parity(app, verbose):
+    """Vectorized vs statsmodels forecasts on the bundled data.
+
+    The difference for each location is the largest absolute gap over the
+    forecast horizon divided by the mean of its observed cases.
+    """
+    import pandas as pd
+    from vectorized_hw import PARITY_TOLERANCE
+
+    df = pd.read_csv(os.path.join(BACKEND_DIR, app.DATA_FILE))
+    log(f"parity: vectorized vs statsmodels on {app.DATA_FILE}")
+    forecasts = {}
+    for backend in ('statsmodels', 'vectorized'):
+        with quiet(not verbose):
+            _, forecasts[backend], _ = app.train_models(df, workers=1, backend=backend, config=app.MODEL_CONFIG)
+
+    means = df.groupby('Location')['Cases'].mean()
+    differences = {}
+    for location, expected in forecasts['statsmodels'].items():
+        actual = forecasts['vectorized'][location]['Predicted Cases'].to_numpy()
+        gap = np.abs(actual - expected['Predicted Cases'].to_numpy()).max()
+        differences[location] = float(gap / means[location])
+    worst = max(differences, key=differences.get)
+
+    return [{
+        'benchmark': 'parity',
+        'params': {'data': app.DATA_FILE, 'locations': len(differences)},
+        'metrics': {
+            'max_relative_diff': round(differences[worst], 4),
+            'mean_relative_diff': round(float(np.mean(list(differences.values()))), 4),
+            'worst_location': worst,
+            'tolerance': PARITY_TOLERANCE,
+            'passed': differences[worst] <= PARITY_TOLERANCE,
+        },
+    }]
+
+
+def bench_predict(app, n_requests, seed=0):
+    snapshot = app.get_snapshot()
+    index = snapshot.index
+    locations = index.locations
+    month_names = list(app.MONTH_MAPPING)
+    years = sorted(set(int(year) for year in snapshot.df['Year']))
+    # Cover both stored actuals and the forecast horizon
+    year_range = np.arange(years[0], years[-1] + app.MODEL_CONFIG['forecast_horizon'] // 12 + 1)
+
+    rng = np.random.default_rng(seed)
+    queries = [
+        {
+            'location': locations[rng.integers(len(locations))],
+            'month': month_names[rng.integers(12)],
+            'year': int(rng.choice(year_range)),
+        }
+        for _ in range(n_requests)
+    ]
+
+    client = app.app.test_client()
+    # Warm up routing, JSON encoding and the first-request paths
+    for query in queries[:20]:
+        client.post('/api/predict', json=query)
+
+    log(f"predict: {n_requests} requests over {len(locations)} locations")
+    latencies = np.empty(n_requests)
+    errors = 0
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        request_start = time.perf_counter()
+        response = client.post('/api/predict', json=query)
+        latencies[i] = time.perf_counter() - request_start
+        if response.status_code != 200:
+            errors += 1
+    total = time.perf_counter() - start
+
+    return [{
+        'benchmark': 'predict',
+        'params': {'requests': n_requests, 'locations': len(locations)},
+        'metrics': {
+            'seconds': round(total, 4),
+            'requests_per_second': round(n_requests / total, 1),
+            'p50_ms': percentile_ms(latencies, 50),
+            'p95_ms': percentile_ms(latencies, 95),
+            'p99_ms': percentile_ms(latencies, 99),
+            'max_ms': round(float(latencies.max()) * 1000, 3),
+            'errors': errors,
+        },
+    }]
+
+
+def bench_alerts(app, sizes, stub, verbose):
+    from db import get_db
+
+    locations = app.get_snapshot().index.locations
+    results = []
+    for n_subscribers in sizes:
+        log(f"alerts: inserting {n_subscribers} subscribers")
+        with get_db() as conn:
+            insert_subscribers(conn, n_subscribers, locations)
+        stub.reset()
+
+        log(f"alerts: sending daily alerts to {n_subscribers} subscribers")
+        start = time.perf_counter()
+        with quiet(not verbose):
+            app.send_alerts_by_frequency('daily')
+        seconds = time.perf_counter() - start
+
+        with get_db() as conn:
+            logged = conn.execute("SELECT COUNT(*) FROM alert_logs WHERE status = 'sent'").fetchone()[0]
+        results.append({
+            'benchmark': 'alerts',
+            'params': {'subscribers': n_subscribers, 'locations': len(locations),
+                       'sms_latency': stub.latency},
+            'metrics': {
+                'seconds': round(seconds, 4),
+                'subscribers_per_second': round(n_subscribers / seconds, 1),
+                'sms_requests': stub.requests,
+                'sms_recipients': stub.recipients,
+                'logged_sent': logged,
+            },
+        })
+    return results
+
+
+def environment_info():
+    import pandas as pd
+
+    info = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+    try:
+        import statsmodels
+        info['statsmodels'] = statsmodels.__version__
+    except ImportError:
+        pass
+    try:
+        info['git_commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+
+def result_key(result):
+    return result['benchmark'], json.dumps(result['params'], sort_keys=True)
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression descriptions against baseline results"""
+    previous = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        metric = REGRESSION_METRICS[result['benchmark']]
+        new_value, old_value = result['metrics'][metric], old['metrics'][metric]
+        if old_value and new_value > old_value * (1 + tolerance):
+            regressions.append(f"{result['benchmark']} {result['params']}: "
+                               f"{metric} {old_value} -> {new_value}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DengueWatch backend hot paths")
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=BENCHMARKS,
+                        help="Benchmarks to run (default: all)")
+    parser.add_argument('--quick', action='store_true', help="Use small sizes for a fast smoke run")
+    parser.add_argument('--train-sizes', nargs='+', type=int, help="Location counts for training")
+    parser.add_argument('--train-backends', nargs='+', default=['statsmodels', 'vectorized'],
+                        choices=['statsmodels', 'vectorized'])
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Training processes for the statsmodels backend (default: TRAINING_WORKERS)")
+    parser.add_argument('--predict-locations', type=int, help="Locations in the served dataset")
+    parser.add_argument('--predict-requests', type=int, help="Number of /api/predict calls")
+    parser.add_argument('--alert-sizes', nargs='+', type=int, help="Subscriber counts for alert delivery")
+    parser.add_argument('--sms-latency', type=float, default=0.0,
+                        help="Seconds the stub Fast2SMS server waits before answering")
+    parser.add_argument('--output', help="Write results JSON here instead of stdout")
+    parser.add_argument('--baseline', help="Earlier results JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument('--keep-workdir', action='store_true', help="Don't delete the scratch directory")
+    parser.add_argument('--verbose', action='store_true', help="Show the app's own output")
+    args = parser.parse_args(argv)
+
+    sizes = QUICK_SIZES if args.quick else DEFAULT_SIZES
+    train_sizes = args.train_sizes or sizes['train']
+    alert_sizes = args.alert_sizes or sizes['alerts']
+    predict_locations = args.predict_locations or (20 if args.quick else 100)
+    predict_requests = args.predict_requests or (500 if args.quick else 5000)
+
+    stub = StubSMSServer(latency=args.sms_latency).start()
+    workdir = tempfile.mkdtemp(prefix='dengue-bench-')
+    cwd = os.getcwd()
+
+    # The app reads these at import, so point everything at the scratch dir first
+    os.environ.setdefault('FAST2SMS_API_KEY', 'benchmark-key')
+    os.environ['FAST2SMS_URL'] = stub.url
+    os.environ['DB_NAME'] = os.path.join(workdir, 'benchmark.db')
+    os.environ['MODEL_STORE_DIR'] = os.path.join(workdir, 'model_store')
+    os.environ['DATA_STORE_DIR'] = os.path.join(workdir, 'data_store')
+    os.environ['SCHEDULER_LOCK_FILE'] = os.path.join(workdir, 'scheduler.lock')
+
+    results = []
+    try:
+        os.chdir(workdir)
+        with quiet(not args.verbose):
+            import app
+
+        if 'train' in args.only:
+            results += bench_train(app, train_sizes, args.train_backends, args.workers, args.verbose)
+        if 'parity' in args.only:
+            results += bench_parity(app, args.verbose)
+
+        if 'predict' in args.only or 'alerts' in args.only:
+            log(f"setup: serving {predict_locations} synthetic locations")
+            make_cases(predict_locations).to_csv(app.DATA_FILE, index=False)
+            with quiet(not args.verbose):
+                app.load_data()
+
+        if 'predict' in args.only:
+            results += bench_predict(app, predict_requests)
+        if 'alerts' in args.only:
+            results += bench_alerts(app, alert_sizes, stub, args.verbose)
+    finally:
+        os.chdir(cwd)
+        stub.stop()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = {'environment': environment_info(), 'results': results}
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        log(f"Wrote {len(results)} results to {args.output}")
+    else:
+        print(text)
+
+    status = 0
+    for result in results:
+        if result['benchmark'] == 'parity' and not result['metrics']['passed']:
+            log(f"PARITY vectorized forecasts for {result['metrics']['worst_location']} differ from statsmodels "
+                f"by {result['metrics']['max_relative_diff']:.1%} of the mean, "
+                f"over the {result['metrics']['tolerance']:.0%} tolerance")
+            status = 1
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            log(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Local stand-in for the Fast2SMS bulkV2 API.
+
+Accepts form-encoded POSTs, counts requests and recipients, and always
+answers with a success response, so alert delivery can be benchmarked
+without network access or SMS credits.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class StubSMSServer:
+    def __init__(self, latency=0.0):
+        # Seconds to wait before answering, to mimic the real API's round trip
+        self.latency = latency
+        self.requests = 0
+        self.recipients = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}/dev/bulkV2"
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                numbers = parse_qs(body).get('numbers', [''])[0]
+                with stub._lock:
+                    stub.requests += 1
+                    stub.recipients += len(numbers.split(',')) if numbers else 0
+                if stub.latency:
+                    threading.Event().wait(stub.latency)
+
+                payload = json.dumps({'return': True, 'request_id': f'stub-{stub.requests}'}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.recipients = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
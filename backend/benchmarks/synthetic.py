@@ -0,0 +1,65 @@
+"""Synthetic case data and subscribers shaped like the real inputs"""
+import numpy as np
+import pandas as pd
+
+MONTHS_PER_YEAR = 12
+
+
+def make_cases(n_locations, start_year=2010, end_year=2024, seed=0):
+    """Monthly cases for n_locations with trend, seasonality and noise.
+
+    Columns match dengue_cases_bangalore.csv. Case counts stay well below
+    the outbreak threshold so predictions don't trigger outbreak alerts.
+    """
+    rng = np.random.default_rng(seed)
+    years = np.arange(start_year, end_year + 1)
+    n_months = len(years) * MONTHS_PER_YEAR
+    t = np.arange(n_months)
+
+    base = rng.uniform(15, 40, size=(n_locations, 1))
+    trend = rng.uniform(-0.02, 0.05, size=(n_locations, 1))
+    amplitude = rng.uniform(5, 15, size=(n_locations, 1))
+    phase = rng.uniform(0, 2 * np.pi, size=(n_locations, 1))
+    cases = (base + trend * t + amplitude * np.sin(2 * np.pi * t / MONTHS_PER_YEAR + phase)
+             + rng.normal(0, 3, size=(n_locations, n_months)))
+    cases = np.clip(np.rint(cases), 0, None).astype(int)
+
+    locations = [f"Ward {i:04d}" for i in range(n_locations)]
+    latitude = rng.uniform(12.85, 13.10, size=n_locations)
+    longitude = rng.uniform(77.45, 77.75, size=n_locations)
+
+    # Rows ordered by month, then location, like the real CSV
+    month_idx = np.repeat(t, n_locations)
+    location_idx = np.tile(np.arange(n_locations), n_months)
+    rows = len(month_idx)
+    return pd.DataFrame({
+        'Year': years[month_idx // MONTHS_PER_YEAR],
+        'Month': month_idx % MONTHS_PER_YEAR + 1,
+        'Location': np.array(locations)[location_idx],
+        'Latitude': latitude[location_idx].round(4),
+        'Longitude': longitude[location_idx].round(4),
+        'Temperature': rng.uniform(18, 35, size=rows).round(1),
+        'Rainfall': rng.uniform(0, 300, size=rows).round(1),
+        'Precipitation': rng.uniform(0, 100, size=rows).round(1),
+        'Mosquito_Density': rng.uniform(5, 150, size=rows).round(1),
+        'Cases': cases.T.ravel(),
+    })
+
+
+def insert_subscribers(conn, n, locations, frequency='daily', batch_size=50000, seed=0):
+    """Replace all subscribers with n synthetic ones spread over locations"""
+    rng = np.random.default_rng(seed)
+    with conn:
+        conn.execute("DELETE FROM alert_logs")
+        conn.execute("DELETE FROM subscribers")
+    for start in range(0, n, batch_size):
+        ids = range(start, min(start + batch_size, n))
+        picks = rng.integers(0, len(locations), size=len(ids))
+        rows = [
+            (f"Subscriber {i}", f"9{i:09d}", f"subscriber{i}@example.com",
+             locations[pick], frequency)
+            for i, pick in zip(ids, picks)
+        ]
+        with conn:
+            conn.executemany("""INSERT INTO subscribers (name, mobile, email, location, alert_frequency)
+                                VALUES (?, ?, ?, ?, ?)""", rows)
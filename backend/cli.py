@@ -0,0 +1,154 @@
+"""Command line tools for operating the DengueWatch backend.
+
+Run from the backend directory, e.g.:
+
+    python cli.py ingest new_month.csv
+    python cli.py select-models
+    python cli.py import-subscribers partners.csv
+    python cli.py export-subscribers --output subscribers.csv
+    python cli.py compact-alert-logs
+"""
+import argparse
+import sys
+
+
+def ingest(args):
+    import pandas as pd
+    import app
+
+    new_rows = pd.read_csv(args.path)
+    app.load_data()
+    report = app.ingest_observations(new_rows, refit=args.refit)
+    return 1 if report['failed'] else 0
+
+
+def select_models(args):
+    import app
+    from climate_model import prepare_frames
+    from data_store import load_frame
+    from model_selection import SELECTION_FOLDS, SELECTION_HORIZON, select_models as run_selection
+    from model_store import save_selection
+    from training import prepare_series
+
+    df, _ = load_frame(app.DATA_FILE)
+    series_by_location = prepare_series(df)
+    frames_by_location = prepare_frames(df, series_by_location)
+    folds = args.folds or SELECTION_FOLDS
+    horizon = args.horizon or SELECTION_HORIZON
+    print(f"Backtesting {len(series_by_location)} locations ({folds} folds x {horizon} months)...")
+    selection = run_selection(series_by_location, app.MODEL_CONFIG, workers=args.workers,
+                              folds=folds, horizon=horizon, frames_by_location=frames_by_location)
+
+    for location, result in selection['locations'].items():
+        if result['winner'] is None:
+            print(f"{location}: no candidate could be scored, keeping the default model")
+            continue
+        default = result['scores'].get('additive')
+        baseline = f" (additive: {default})" if default is not None else ""
+        print(f"{location}: {result['winner']} MAE {result['scores'][result['winner']]}{baseline}")
+    print(f"Selection took {selection['total_seconds']}s using {selection['workers']} workers")
+
+    if args.dry_run:
+        return 0
+    save_selection(selection)
+    print("Saved; models are retrained with the winners on the next load")
+    return 0
+
+
+def import_subscribers(args):
+    import json
+    import os
+    from db import migrate
+    from subscriber_import import import_subscribers as run_import, read_rows
+
+    fmt = args.format or ('ndjson' if os.path.splitext(args.path)[1] in ('.ndjson', '.jsonl') else 'csv')
+    migrate()
+    with open(args.path, encoding='utf-8-sig', newline='') as f:
+        report = run_import(read_rows(f, fmt), batch_size=args.batch_size, dry_run=args.dry_run)
+
+    for error in report['errors']:
+        print(f"Row {error['row']}: {error['error']}")
+    if report['failed'] > len(report['errors']):
+        print(f"... and {report['failed'] - len(report['errors'])} more rejected rows")
+    print(json.dumps({key: report[key] for key in ('received', 'inserted', 'updated', 'failed')}))
+    return 1 if report['failed'] else 0
+
+
+def export_subscribers(args):
+    from db import migrate
+    from pagination import iter_rows
+    from subscriber_import import IMPORT_COLUMNS
+
+    migrate()
+    query = f"SELECT {', '.join(IMPORT_COLUMNS)} FROM subscribers ORDER BY id"
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        for chunk in iter_rows(query, [], IMPORT_COLUMNS, args.format):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+def compact_alert_logs(args):
+    from alert_log_store import compact_alert_logs as run_compaction
+    from db import migrate
+
+    migrate()
+    report = run_compaction(retention_days=args.retention_days, batch_size=args.batch_size)
+    print(f"Archived {report['archived']} rows older than {report['cutoff']} into {len(report['files'])} files, "
+          f"pruned {report['templates_pruned']} message templates")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DengueWatch backend tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser(
+        'ingest', help="Append monthly observations and update only the affected locations")
+    ingest_parser.add_argument('path', help="CSV with Year, Month, Location and Cases columns")
+    ingest_parser.add_argument('--refit', action='store_true',
+                               help="Refit affected locations instead of re-forecasting with current parameters")
+    ingest_parser.set_defaults(func=ingest)
+
+    select_parser = subparsers.add_parser(
+        'select-models', help="Backtest candidate models per location and store the winners")
+    select_parser.add_argument('--folds', type=int, default=None, help="Rolling origins per location")
+    select_parser.add_argument('--horizon', type=int, default=None, help="Months forecast at each origin")
+    select_parser.add_argument('--workers', type=int, default=None,
+                               help="Processes to backtest with (default: TRAINING_WORKERS, or one per CPU)")
+    select_parser.add_argument('--dry-run', action='store_true', help="Print the winners without saving them")
+    select_parser.set_defaults(func=select_models)
+
+    import_parser = subparsers.add_parser(
+        'import-subscribers', help="Bulk upsert subscribers from a CSV or NDJSON file")
+    import_parser.add_argument('path', help="File with name, email, mobile, location and alert_frequency")
+    import_parser.add_argument('--format', choices=['csv', 'ndjson'], default=None,
+                               help="Input format (default: from the file extension)")
+    import_parser.add_argument('--batch-size', type=int, default=None,
+                               help="Rows per transaction (default: SUBSCRIBER_IMPORT_BATCH_SIZE)")
+    import_parser.add_argument('--dry-run', action='store_true', help="Validate without writing")
+    import_parser.set_defaults(func=import_subscribers)
+
+    export_parser = subparsers.add_parser(
+        'export-subscribers', help="Write every subscriber in the import format")
+    export_parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    export_parser.add_argument('--output', default=None, help="File to write (default: stdout)")
+    export_parser.set_defaults(func=export_subscribers)
+
+    compact_parser = subparsers.add_parser(
+        'compact-alert-logs', help="Archive and roll up alert logs older than the retention window")
+    compact_parser.add_argument('--retention-days', type=int, default=None,
+                                help="Days of detailed logs to keep (default: ALERT_LOG_RETENTION_DAYS)")
+    compact_parser.add_argument('--batch-size', type=int, default=None,
+                                help="Rows per archive file and transaction (default: ALERT_LOG_COMPACT_BATCH)")
+    compact_parser.set_defaults(func=compact_alert_logs)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
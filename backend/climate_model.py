@@ -0,0 +1,209 @@
+"""Climate-covariate forecaster: ridge regression on lagged weather features.
+
+Cases in month t are regressed on a linear trend, month-of-year
+indicators and Temperature, Rainfall, Precipitation and Mosquito_Density
+from config['climate_lags'] months earlier. Every location shares the same
+feature layout, so the training data is one (locations x months x
+features) array and all locations are solved together in a single
+batched ridge least-squares pass.
+
+Future covariates are unknown. A forecast uses the observed value when
+the lag reaches back into the data; otherwise it uses the location's
+average for that calendar month.
+
+The result has the same shape as training.train_locations(). The params
+dict is marked with 'model': 'climate' so it is never passed to the
+Holt-Winters re-forecasting path.
+"""
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+COVARIATES = ['Temperature', 'Rainfall', 'Precipitation', 'Mosquito_Density']
+
+
+def prepare_frames(df, series_by_location):
+    """Monthly covariates for each location in series_by_location, next to its Cases series"""
+    columns = [column for column in COVARIATES if column in df.columns]
+    df = df[df['Location'].isin(list(series_by_location))][['Location', 'Year', 'Month'] + columns].copy()
+    if 'MonthIndex' in df.columns:
+        month_index = df['MonthIndex'].to_numpy(dtype=np.int64)
+    else:
+        month_index = df['Year'].to_numpy(dtype=np.int64) * 12 + df['Month'].to_numpy(dtype=np.int64) - 1
+    df['Date'] = pd.to_datetime(pd.DataFrame(
+        {'year': month_index // 12, 'month': month_index % 12 + 1, 'day': 1}, index=df.index))
+
+    frames = {}
+    for location, location_df in df.groupby('Location', sort=False, observed=True):
+        cases = series_by_location[location]
+        covariates = (location_df.set_index('Date')[columns]
+                      .astype(float)
+                      .resample('ME')
+                      .mean()
+                      .interpolate(method='linear', limit_direction='both'))
+        frame = covariates.reindex(cases.index)
+        frame['Cases'] = cases
+        frames[location] = frame
+    return frames
+
+
+def _features(covariates, month_of_year, trend, lags):
+    """Design array (..., T, F) from covariates (..., T_cov, C) already aligned for the lags.
+
+    covariates[..., t + max_lag - k, :] is the value k months before target t.
+    """
+    max_lag = max(lags)
+    steps = trend.shape[-1]
+    lagged = [covariates[..., max_lag - k:max_lag - k + steps, :] for k in lags]
+    seasonal = np.eye(12)[month_of_year]
+    batch = covariates.shape[:-2]
+    return np.concatenate(
+        [np.broadcast_to(trend[..., None], batch + (steps, 1)),
+         np.broadcast_to(seasonal, batch + seasonal.shape)] + lagged,
+        axis=-1)
+
+
+def fit_batch(y, covariates, month_of_year, lags, ridge):
+    """Fit ridge regressions for every row of y at once.
+
+    y is (L, T) cases; covariates is (L, T, C) for the same months;
+    month_of_year is (T,) in 0-11. The first max(lags) months only supply
+    lagged values and are not fitted. Returns a dict of stacked params.
+    """
+    max_lag = max(lags)
+    steps = y.shape[1] - max_lag
+    trend = np.arange(max_lag, y.shape[1]) / 12.0
+    X = _features(covariates, month_of_year[max_lag:], trend, lags)
+    target = y[:, max_lag:]
+
+    # Standardize per location so one ridge strength suits every feature
+    mean = X.mean(axis=1, keepdims=True)
+    scale = X.std(axis=1, keepdims=True)
+    scale[scale == 0] = 1.0
+    Xs = (X - mean) / scale
+    intercept = target.mean(axis=1)
+    centered = target - intercept[:, None]
+
+    n_features = X.shape[-1]
+    gram = Xs.transpose(0, 2, 1) @ Xs + ridge * steps * np.eye(n_features)
+    rhs = Xs.transpose(0, 2, 1) @ centered[:, :, None]
+    coef = np.linalg.solve(gram, rhs)[:, :, 0]
+
+    fitted = intercept[:, None] + (Xs @ coef[:, :, None])[:, :, 0]
+    sigma = np.sqrt(((target - fitted) ** 2).mean(axis=1))
+    return {
+        'coef': coef,
+        'intercept': intercept,
+        'feature_mean': mean[:, 0, :],
+        'feature_scale': scale[:, 0, :],
+        'sigma': sigma,
+    }
+
+
+def forecast_batch(params, y, covariates, month_of_year, lags, steps):
+    """Forecast steps months past the end of y for every row"""
+    locations, observed = y.shape
+    max_lag = max(lags)
+    # Per-location average of each covariate by calendar month stands in for the future
+    climatology = np.stack([covariates[:, month_of_year == month, :].mean(axis=1) for month in range(12)], axis=1)
+
+    future_months = (month_of_year[-1] + 1 + np.arange(steps)) % 12
+    future_covariates = climatology[:, future_months, :]
+    history = np.concatenate([covariates[:, observed - max_lag:, :], future_covariates], axis=1)
+    trend = np.arange(observed, observed + steps) / 12.0
+
+    X = _features(history, future_months, trend, lags)
+    Xs = (X - params['feature_mean'][:, None, :]) / params['feature_scale'][:, None, :]
+    return params['intercept'][:, None] + (Xs @ params['coef'][:, :, None])[:, :, 0]
+
+
+def _stack(frames, locations):
+    y = np.vstack([frames[location]['Cases'].to_numpy(dtype=float) for location in locations])
+    columns = [column for column in COVARIATES if column in frames[locations[0]].columns]
+    covariates = np.stack([frames[location][columns].to_numpy(dtype=float) for location in locations])
+    month_of_year = frames[locations[0]].index.month.to_numpy() - 1
+    return y, covariates, month_of_year
+
+
+def train_climate(frames_by_location, config):
+    """Fit and forecast every location; same return shape as train_locations()"""
+    lags = list(config['climate_lags'])
+    horizon = config['forecast_horizon']
+    z = NormalDist().inv_cdf((1 + config['interval_level']) / 2)
+    start = time.perf_counter()
+    models = {}
+    forecasts = {}
+    report = {'workers': 1, 'locations': {}, 'failed': []}
+
+    # Only locations on the same months can share one array
+    groups = {}
+    for location, frame in frames_by_location.items():
+        groups.setdefault((frame.index[0], len(frame)), []).append(location)
+
+    for (first_date, length), locations in groups.items():
+        group_start = time.perf_counter()
+        y, covariates, month_of_year = _stack(frames_by_location, locations)
+        error = None
+        if length < max(lags) + 24:
+            error = "ValueError: need at least two years of data after the longest lag"
+        elif np.isnan(y).any() or np.isnan(covariates).any():
+            error = "ValueError: series or covariates contain missing values"
+
+        if error is None:
+            params = fit_batch(y, covariates, month_of_year, lags, config['climate_ridge'])
+            forecast = forecast_batch(params, y, covariates, month_of_year, lags, horizon)
+            last_date = frames_by_location[locations[0]].index[-1]
+            future_dates = pd.date_range(start=last_date + pd.DateOffset(months=1), periods=horizon, freq='ME')
+
+        per_location = (time.perf_counter() - group_start) / len(locations)
+        for i, location in enumerate(locations):
+            report['locations'][location] = {
+                'fit_seconds': round(per_location, 4),
+                'status': 'failed' if error else 'ok',
+                'error': error,
+                'warnings': [],
+            }
+            if error:
+                report['failed'].append(location)
+                continue
+            models[location] = {
+                'model': 'climate',
+                'lags': lags,
+                'covariates': [column for column in COVARIATES if column in frames_by_location[location].columns],
+                'coef': params['coef'][i],
+                'intercept': float(params['intercept'][i]),
+                'feature_mean': params['feature_mean'][i],
+                'feature_scale': params['feature_scale'][i],
+                'sigma': float(params['sigma'][i]),
+            }
+            width = z * params['sigma'][i]
+            forecasts[location] = pd.DataFrame({
+                'Predicted Cases': forecast[i],
+                'Lower Bound': (forecast[i] - width).astype(np.float32),
+                'Upper Bound': (forecast[i] + width).astype(np.float32),
+            }, index=future_dates)
+
+    report['total_seconds'] = round(time.perf_counter() - start, 4)
+    return models, forecasts, report
+
+
+def backtest(frame, config, folds, horizon):
+    """Rolling-origin mean absolute error for one location, or None if too short"""
+    lags = list(config['climate_lags'])
+    y, covariates, month_of_year = _stack({'location': frame}, ['location'])
+    origins = [len(frame) - horizon * k for k in range(folds, 0, -1)]
+    origins = [origin for origin in origins if origin >= max(lags) + 24]
+    if not origins or np.isnan(y).any() or np.isnan(covariates).any():
+        return None
+
+    errors = []
+    for origin in origins:
+        params = fit_batch(y[:, :origin], covariates[:, :origin], month_of_year[:origin], lags,
+                           config['climate_ridge'])
+        test = y[0, origin:origin + horizon]
+        forecast = forecast_batch(params, y[:, :origin], covariates[:, :origin], month_of_year[:origin],
+                                  lags, len(test))[0]
+        errors.append(np.abs(forecast - test))
+    return float(np.concatenate(errors).mean())
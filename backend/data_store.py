@@ -0,0 +1,171 @@
+"""Columnar binary copy of the case data, rebuilt only when the CSV changes.
+
+Each column is stored as a typed .npy file (Location as categorical
+codes, plus a precomputed month index) and memory-mapped on load, so
+startup skips CSV parsing and dtype inference entirely. A manifest
+records the source CSV's size, mtime and content hash; if the CSV no
+longer matches, the store is rebuilt from it.
+
+pandas is imported only when the store is built or loaded, so
+data_hash() is cheap enough for processes that serve without the data.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+DATA_STORE_DIR = os.environ.get('DATA_STORE_DIR', 'data_store')
+
+# Bump whenever the column layout changes
+DATA_STORE_FORMAT_VERSION = 1
+
+COLUMN_DTYPES = {
+    'Year': np.int16,
+    'Month': np.int8,
+    'Latitude': np.float64,
+    'Longitude': np.float64,
+    'Temperature': np.float32,
+    'Rainfall': np.float32,
+    'Precipitation': np.float32,
+    'Mosquito_Density': np.float32,
+    'Cases': np.int32,
+}
+
+MANIFEST_NAME = 'current.json'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_manifest():
+    try:
+        with open(os.path.join(DATA_STORE_DIR, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != DATA_STORE_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def _write_manifest(manifest):
+    fd, tmp_path = tempfile.mkstemp(dir=DATA_STORE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(DATA_STORE_DIR, MANIFEST_NAME))
+
+
+def build_store(csv_path, sha256=None):
+    """Convert csv_path into a new columnar store and make it current"""
+    import pandas as pd
+
+    sha256 = sha256 or file_sha256(csv_path)
+    stat = os.stat(csv_path)
+    df = pd.read_csv(csv_path, dtype={'Location': 'category'})
+
+    os.makedirs(DATA_STORE_DIR, exist_ok=True)
+    version_dir = os.path.join(DATA_STORE_DIR, sha256[:32])
+    tmp_dir = tempfile.mkdtemp(dir=DATA_STORE_DIR)
+    try:
+        columns = []
+        for column, dtype in COLUMN_DTYPES.items():
+            if column in df.columns:
+                np.save(os.path.join(tmp_dir, f'{column}.npy'), df[column].to_numpy(dtype=dtype))
+                columns.append(column)
+
+        locations = df['Location'].cat
+        np.save(os.path.join(tmp_dir, 'Location.codes.npy'), locations.codes.to_numpy(dtype=np.int32))
+        month_index = df['Year'].to_numpy(dtype=np.int32) * 12 + df['Month'].to_numpy(dtype=np.int32) - 1
+        np.save(os.path.join(tmp_dir, 'MonthIndex.npy'), month_index)
+
+        if os.path.exists(version_dir):
+            shutil.rmtree(version_dir)
+        os.replace(tmp_dir, version_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    manifest = {
+        'format': DATA_STORE_FORMAT_VERSION,
+        'directory': os.path.basename(version_dir),
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256,
+        'column_order': list(df.columns),
+        'columns': columns,
+        'categories': locations.categories.tolist(),
+        'rows': len(df),
+    }
+    _write_manifest(manifest)
+    _prune(version_dir)
+    return manifest
+
+
+def _prune(current_dir):
+    for name in os.listdir(DATA_STORE_DIR):
+        path = os.path.join(DATA_STORE_DIR, name)
+        if os.path.isdir(path) and path != current_dir:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def data_hash(csv_path):
+    """SHA-256 of csv_path, from the manifest while the file still matches it"""
+    manifest = _read_manifest()
+    stat = os.stat(csv_path)
+    if (manifest is not None and manifest['source_size'] == stat.st_size
+            and manifest['source_mtime_ns'] == stat.st_mtime_ns):
+        return manifest['sha256']
+    return file_sha256(csv_path)
+
+
+def fresh_manifest(csv_path):
+    """Return the manifest if the store matches csv_path, rebuilding it if stale"""
+    manifest = _read_manifest()
+    stat = os.stat(csv_path)
+    if manifest is not None:
+        if (manifest['source_size'] == stat.st_size
+                and manifest['source_mtime_ns'] == stat.st_mtime_ns):
+            return manifest
+
+        # The file was touched; only rebuild if its contents changed
+        sha256 = file_sha256(csv_path)
+        if sha256 == manifest['sha256']:
+            manifest['source_mtime_ns'] = stat.st_mtime_ns
+            _write_manifest(manifest)
+            return manifest
+        print(f"{csv_path} changed, rebuilding columnar data store")
+        return build_store(csv_path, sha256)
+
+    print(f"Building columnar data store for {csv_path}")
+    return build_store(csv_path)
+
+
+def load_frame(csv_path):
+    """Load the case data from the columnar store.
+
+    Returns (df, sha256 of the CSV). Columns are memory-mapped and
+    Location is categorical; MonthIndex holds year * 12 + month - 1.
+    """
+    import pandas as pd
+
+    manifest = fresh_manifest(csv_path)
+    version_dir = os.path.join(DATA_STORE_DIR, manifest['directory'])
+
+    data = {}
+    for column in manifest['column_order']:
+        if column == 'Location':
+            codes = np.load(os.path.join(version_dir, 'Location.codes.npy'), mmap_mode='r')
+            data[column] = pd.Categorical.from_codes(codes, categories=manifest['categories'])
+        elif column in manifest['columns']:
+            data[column] = np.load(os.path.join(version_dir, f'{column}.npy'), mmap_mode='r')
+    data['MonthIndex'] = np.load(os.path.join(version_dir, 'MonthIndex.npy'), mmap_mode='r')
+
+    return pd.DataFrame(data, copy=False), manifest['sha256']
@@ -0,0 +1,264 @@
+"""SQLite access layer: pooled connections, WAL mode and schema migrations.
+
+Connections are opened once and reused across requests and the alert
+scheduler instead of being opened and closed per call. The database runs
+in WAL mode so readers never block behind the scheduler's writes.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from string import Template
+
+import metrics
+
+DB_NAME = os.environ.get('DB_NAME', 'dengue_subscribers.db')
+# Idle connections kept open; bursts beyond this open short-lived extras
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+DB_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', '30'))
+# Values bound per IN (...) lookup; stays well under SQLite's bound parameter limit
+MAX_IN_PARAMS = 900
+
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version).
+# Never edit an entry once released; append a new one instead.
+MIGRATIONS = [
+    # 1: base schema
+    [
+        '''CREATE TABLE IF NOT EXISTS subscribers
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            mobile TEXT NOT NULL,
+            location TEXT NOT NULL,
+            subscribed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_alert_sent TIMESTAMP,
+            alert_frequency TEXT DEFAULT 'weekly')''',
+        '''CREATE TABLE IF NOT EXISTS alert_logs
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subscriber_id INTEGER,
+            alert_type TEXT NOT NULL,
+            message TEXT NOT NULL,
+            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT,
+            error_message TEXT,
+            FOREIGN KEY (subscriber_id) REFERENCES subscribers (id))''',
+    ],
+    # 2: indexes for the scheduler scans and the alert log listing
+    [
+        'CREATE INDEX IF NOT EXISTS idx_subscribers_frequency ON subscribers (alert_frequency, id)',
+        'CREATE INDEX IF NOT EXISTS idx_subscribers_location ON subscribers (location)',
+        'CREATE INDEX IF NOT EXISTS idx_alert_logs_sent_at ON alert_logs (sent_at)',
+        'CREATE INDEX IF NOT EXISTS idx_alert_logs_subscriber ON alert_logs (subscriber_id)',
+    ],
+    # 3: durable alert scheduler runs, one row per shard, checkpointed by subscriber id
+    [
+        '''CREATE TABLE IF NOT EXISTS alert_jobs
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            frequency TEXT NOT NULL,
+            scheduled_for TEXT NOT NULL,
+            shard INTEGER NOT NULL DEFAULT 0,
+            shard_count INTEGER NOT NULL DEFAULT 1,
+            after_id INTEGER NOT NULL DEFAULT 0,
+            until_id INTEGER,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            processed INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            heartbeat_at REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            error TEXT,
+            UNIQUE (frequency, scheduled_for, shard))''',
+        'CREATE INDEX IF NOT EXISTS idx_alert_jobs_status ON alert_jobs (status)',
+    ],
+    # 4: alert log retention: deduplicated message bodies, daily rollups, archive records
+    [
+        '''CREATE TABLE IF NOT EXISTS message_templates
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            body TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+        'ALTER TABLE alert_logs ADD COLUMN template_id INTEGER REFERENCES message_templates (id)',
+        # Existing rows keep an empty message and point at their template
+        """INSERT OR IGNORE INTO message_templates (body)
+           SELECT DISTINCT message FROM alert_logs WHERE message != ''""",
+        """UPDATE alert_logs
+           SET template_id = (SELECT id FROM message_templates WHERE body = alert_logs.message), message = ''
+           WHERE message != ''""",
+        'CREATE INDEX IF NOT EXISTS idx_alert_logs_template ON alert_logs (template_id)',
+        '''CREATE TABLE IF NOT EXISTS alert_log_daily
+           (day TEXT NOT NULL,
+            location TEXT NOT NULL,
+            alert_type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, location, alert_type, status))''',
+        'CREATE INDEX IF NOT EXISTS idx_alert_log_daily_location ON alert_log_daily (location, day)',
+        '''CREATE TABLE IF NOT EXISTS alert_log_archives
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT NOT NULL,
+            first_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL,
+            first_sent_at TIMESTAMP,
+            last_sent_at TIMESTAMP,
+            row_count INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    ],
+    # 5: outbreak alert dedup windows, shared by every worker process
+    [
+        '''CREATE TABLE IF NOT EXISTS outbreak_alerts
+           (location TEXT NOT NULL,
+            period TEXT NOT NULL,
+            claimed_at REAL NOT NULL,
+            PRIMARY KEY (location, period))''',
+    ],
+    # 6: alert logs record the subscriber's location when sent, and template parameters
+    [
+        'ALTER TABLE alert_logs ADD COLUMN location TEXT',
+        'ALTER TABLE alert_logs ADD COLUMN params TEXT',
+        # Best effort for existing rows: where the subscriber is now
+        """UPDATE alert_logs
+           SET location = (SELECT location FROM subscribers WHERE subscribers.id = alert_logs.subscriber_id)""",
+    ],
+]
+
+
+query_seconds = metrics.histogram(
+    'sqlite_query_duration_seconds', "Time spent executing SQLite statements",
+    ['operation'], buckets=metrics.FAST_BUCKETS)
+
+
+def _operation(sql):
+    words = sql.split(None, 1)
+    return words[0].upper() if words else 'EMPTY'
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection that records execute() and executemany() durations.
+
+    Rows fetched after execute() returns are not included, so SELECT
+    timings cover planning and the first step only.
+    """
+    def execute(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            query_seconds.observe(time.perf_counter() - start, operation=_operation(sql))
+
+    def executemany(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            query_seconds.observe(time.perf_counter() - start, operation=_operation(sql))
+
+
+def render_message(body, params):
+    """Fill a message template's $placeholders from params, a dict or JSON object.
+
+    Also available in SQL as render_message(body, params). A body with no
+    params is returned unchanged.
+    """
+    if body is None or not params:
+        return body
+    return Template(body).safe_substitute(json.loads(params) if isinstance(params, str) else params)
+
+
+def select_in(conn, sql, values):
+    """Yield the rows of sql for all values, MAX_IN_PARAMS values per query.
+
+    sql marks the spot for the IN list's placeholders with {}, e.g.
+    'SELECT id FROM subscribers WHERE email IN ({})'.
+    """
+    values = list(values)
+    for start in range(0, len(values), MAX_IN_PARAMS):
+        chunk = values[start:start + MAX_IN_PARAMS]
+        yield from conn.execute(sql.format(', '.join('?' * len(chunk))), chunk)
+
+
+def connect(path=None):
+    """Open a connection configured for concurrent use"""
+    conn = sqlite3.connect(path or DB_NAME, timeout=DB_BUSY_TIMEOUT, check_same_thread=False,
+                           factory=TimedConnection)
+    conn.create_function('render_message', 2, render_message, deterministic=True)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # Safe with WAL; only the last transactions can be lost on power failure
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, path, size=DB_POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; uncommitted work is rolled back on return"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = connect(self.path)
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _reset_pool_after_fork():
+    # Connections inherited from the parent must never be used by the child
+    global _pool
+    _pool = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_NAME)
+    return _pool
+
+
+def get_db():
+    """Context manager yielding a pooled connection"""
+    return get_pool().connection()
+
+
+def migrate():
+    """Apply any migrations the database has not seen yet"""
+    with get_db() as conn:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for target, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            with conn:
+                conn.execute('BEGIN')
+                for statement in statements:
+                    conn.execute(statement)
+                # PRAGMA does not accept bound parameters
+                conn.execute(f'PRAGMA user_version = {int(target)}')
+            print(f"Database migrated to schema version {target}")
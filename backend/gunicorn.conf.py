@@ -0,0 +1,23 @@
+"""Gunicorn settings for production serving.
+
+Run from the backend directory:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+
+# Load data and models once in the master, then fork workers that share them
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Threads don't survive fork, so each worker starts its own scheduler
+    # thread; only the one that wins the lock file runs the jobs
+    import app as dengue_app
+    dengue_app.start_scheduler()
@@ -0,0 +1,54 @@
+"""Single-leader election between worker processes on one host.
+
+Every process that wants to run the alert scheduler tries to take an
+exclusive, non-blocking lock on a shared lock file. Exactly one holds it;
+the OS releases it when that process exits, so another worker can take
+over leadership on its next attempt.
+"""
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, fall back to single-process behaviour
+    fcntl = None
+
+SCHEDULER_LOCK_FILE = os.environ.get('SCHEDULER_LOCK_FILE', 'scheduler.lock')
+
+
+class LeaderLock:
+    def __init__(self, path=SCHEDULER_LOCK_FILE):
+        self.path = path
+        self._fd = None
+
+    @property
+    def is_leader(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        """Take the lock if nobody holds it; returns True if we are leader"""
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        # Record the holder to make `cat scheduler.lock` useful when debugging
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
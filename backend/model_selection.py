@@ -0,0 +1,143 @@
+"""Offline per-location model selection by rolling-origin backtesting.
+
+For every location each candidate configuration is fit on the series up
+to several forecast origins and scored on the months that follow
+(mean absolute error across all folds). Locations are backtested in
+parallel over a process pool. The winning configuration per location is
+written to the model store, and training applies it from then on (see
+training.location_config()), so serving never tunes anything itself.
+
+Run it with `python cli.py select-models`.
+"""
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+
+import climate_model
+from training import SELECTABLE_KEYS, TRAINING_WORKERS, build_model
+
+SELECTION_FOLDS = int(os.environ.get('SELECTION_FOLDS', '3'))
+# Months forecast and scored at each origin
+SELECTION_HORIZON = int(os.environ.get('SELECTION_HORIZON', '12'))
+
+# Name -> settings; the first candidate is the default model and wins ties
+CANDIDATES = {
+    'additive': {'trend': 'add', 'damped_trend': False, 'seasonal': 'add', 'use_boxcox': False},
+    'additive-damped': {'trend': 'add', 'damped_trend': True, 'seasonal': 'add', 'use_boxcox': False},
+    'multiplicative': {'trend': 'add', 'damped_trend': False, 'seasonal': 'mul', 'use_boxcox': False},
+    'multiplicative-damped': {'trend': 'add', 'damped_trend': True, 'seasonal': 'mul', 'use_boxcox': False},
+    'additive-boxcox': {'trend': 'add', 'damped_trend': False, 'seasonal': 'add', 'use_boxcox': True},
+    'additive-damped-boxcox': {'trend': 'add', 'damped_trend': True, 'seasonal': 'add', 'use_boxcox': True},
+    # Non-seasonal candidates are the only ones usable on series shorter than two cycles
+    'trend-only': {'trend': 'add', 'damped_trend': False, 'seasonal': None, 'use_boxcox': False},
+    'trend-only-damped': {'trend': 'add', 'damped_trend': True, 'seasonal': None, 'use_boxcox': False},
+    # Ridge regression on lagged climate covariates; only scored when the covariates are passed in
+    'climate-ridge': {'model': 'climate'},
+}
+
+
+def rolling_origins(n_observations, folds, horizon, min_train):
+    """Training lengths for up to folds origins, each followed by horizon test months"""
+    origins = [n_observations - horizon * k for k in range(folds, 0, -1)]
+    return [origin for origin in origins if origin >= min_train]
+
+
+def backtest(series, config, folds, horizon):
+    """Mean absolute error of config over rolling origins, or None if it can't be scored"""
+    m = config['seasonal_periods']
+    # Seasonal models need two full cycles to initialize
+    min_train = 2 * m if config['seasonal'] else m
+    origins = rolling_origins(len(series), folds, horizon, min_train)
+    if not origins:
+        return None
+
+    errors = []
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for origin in origins:
+            train, test = series.iloc[:origin], series.iloc[origin:origin + horizon]
+            fitted = build_model(train, config).fit(optimized=True, remove_bias=config['remove_bias'])
+            forecast = np.asarray(fitted.forecast(len(test)), dtype=float)
+            if not np.all(np.isfinite(forecast)):
+                return None
+            errors.append(np.abs(forecast - test.to_numpy(dtype=float)))
+    return float(np.concatenate(errors).mean())
+
+
+def select_location(location, series, config, folds=SELECTION_FOLDS, horizon=SELECTION_HORIZON, frame=None):
+    """Backtest every candidate for one location and pick the lowest error.
+
+    frame (Cases plus covariates, see climate_model.prepare_frames()) is
+    needed to score the climate candidate.
+    """
+    start = time.perf_counter()
+    scores = {}
+    failures = {}
+    for name, settings in CANDIDATES.items():
+        candidate_config = dict(config, **settings)
+        try:
+            if candidate_config['model'] == 'climate':
+                if frame is None:
+                    continue
+                score = climate_model.backtest(frame, candidate_config, folds, horizon)
+            else:
+                score = backtest(series, candidate_config, folds, horizon)
+        except Exception as e:
+            failures[name] = f"{type(e).__name__}: {str(e)}"
+            continue
+        if score is not None:
+            scores[name] = round(score, 4)
+
+    winner = min(scores, key=scores.get) if scores else None
+    return {
+        'location': location,
+        'winner': winner,
+        'config': dict(CANDIDATES[winner]) if winner else None,
+        'scores': scores,
+        'failures': failures,
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+
+
+def select_models(series_by_location, config, workers=None, folds=SELECTION_FOLDS, horizon=SELECTION_HORIZON,
+                  frames_by_location=None):
+    """Run select_location() for every location over a process pool.
+
+    Without frames_by_location only the Holt-Winters candidates compete.
+
+    Returns the selection report that model_store.save_selection() stores.
+    """
+    if workers is None:
+        workers = TRAINING_WORKERS or os.cpu_count() or 1
+    workers = max(1, min(workers, len(series_by_location) or 1))
+    # Selection always starts from the base settings, never a previous selection
+    config = {key: value for key, value in config.items() if key != 'selection'}
+    frames_by_location = frames_by_location or {}
+
+    start = time.perf_counter()
+    results = []
+    if workers == 1:
+        for location, series in series_by_location.items():
+            results.append(select_location(location, series, config, folds, horizon,
+                                            frames_by_location.get(location)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(select_location, location, series, config, folds, horizon,
+                                       frames_by_location.get(location))
+                       for location, series in series_by_location.items()]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'folds': folds,
+        'horizon': horizon,
+        'workers': workers,
+        'total_seconds': round(time.perf_counter() - start, 4),
+        'base_config': {key: config[key] for key in SELECTABLE_KEYS if key in config},
+        'locations': {result['location']: result for result in sorted(results, key=lambda r: r['location'])},
+    }
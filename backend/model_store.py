@@ -0,0 +1,151 @@
+"""On-disk cache for fitted Holt-Winters models and their forecasts.
+
+Artifacts are keyed by a hash of the input CSV and the model
+hyperparameters, so a process whose inputs have not changed can skip
+training entirely and only refits when the data or config changes.
+
+The store also holds the per-location model selection written by the
+offline `cli.py select-models` job; serving only reads it.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+# Bump whenever the layout of the pickled artifact changes
+STORE_FORMAT_VERSION = 4
+
+MODEL_STORE_DIR = os.environ.get('MODEL_STORE_DIR', 'model_store')
+MODEL_STORE_KEEP = int(os.environ.get('MODEL_STORE_KEEP', '3'))
+
+SELECTION_FILE = 'selection.json'
+
+
+def compute_store_key(data_path, config, data_hash=None):
+    """Hash the data file contents and model config into a store key.
+
+    data_hash, the SHA-256 of the data file, skips re-reading the file
+    when the caller already knows it.
+    """
+    if data_hash is None:
+        data_digest = hashlib.sha256()
+        with open(data_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                data_digest.update(chunk)
+        data_hash = data_digest.hexdigest()
+
+    digest = hashlib.sha256()
+    digest.update(f'format-{STORE_FORMAT_VERSION}'.encode())
+    digest.update(data_hash.encode())
+    digest.update(json.dumps(config, sort_keys=True).encode())
+    return digest.hexdigest()[:32]
+
+
+def _artifact_path(key):
+    return os.path.join(MODEL_STORE_DIR, f'models-{key}.pkl')
+
+
+def load_models(key):
+    """Return the cached artifact for key, or None if missing or unreadable"""
+    path = _artifact_path(key)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            artifact = pickle.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable model artifact {path}: {str(e)}")
+        return None
+
+    if artifact.get('format') != STORE_FORMAT_VERSION or artifact.get('key') != key:
+        return None
+    return artifact
+
+
+def save_models(key, config, params, forecasts, failed=()):
+    """Atomically write fitted params and forecast frames under key.
+
+    failed lists the locations that failed to fit, so a partial model set
+    can be cached and reused without refitting the locations that worked.
+    """
+    os.makedirs(MODEL_STORE_DIR, exist_ok=True)
+    artifact = {
+        'format': STORE_FORMAT_VERSION,
+        'key': key,
+        'config': config,
+        'params': params,
+        'forecasts': forecasts,
+        'failed': sorted(failed),
+    }
+
+    # Write to a temp file first so readers never see a partial artifact
+    fd, tmp_path = tempfile.mkstemp(dir=MODEL_STORE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _artifact_path(key))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    _prune_artifacts()
+
+
+def _prune_artifacts():
+    """Keep only the most recent MODEL_STORE_KEEP artifacts"""
+    artifacts = [
+        os.path.join(MODEL_STORE_DIR, name)
+        for name in os.listdir(MODEL_STORE_DIR)
+        if name.startswith('models-') and name.endswith('.pkl')
+    ]
+    artifacts.sort(key=os.path.getmtime, reverse=True)
+    for path in artifacts[MODEL_STORE_KEEP:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _write_json_atomic(path, data):
+    os.makedirs(MODEL_STORE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=MODEL_STORE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_selection():
+    """Return the stored selection report, or None if no selection was run"""
+    path = os.path.join(MODEL_STORE_DIR, SELECTION_FILE)
+    try:
+        with open(path) as f:
+            selection = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable model selection {path}: {str(e)}")
+        return None
+    return selection
+
+
+def selected_configs(selection=None):
+    """location -> winning config overrides from the stored selection"""
+    if selection is None:
+        selection = load_selection()
+    if not selection:
+        return {}
+    return {location: result['config'] for location, result in selection['locations'].items()
+            if result.get('config')}
+
+
+def save_selection(selection):
+    """Atomically replace the stored selection report"""
+    _write_json_atomic(os.path.join(MODEL_STORE_DIR, SELECTION_FILE), selection)
@@ -0,0 +1,101 @@
+"""Background queue for outbreak alerts.
+
+Request handlers only enqueue an outbreak event; a worker thread sends
+the SMS. Events for the same (location, period) are dropped while an
+earlier one is still inside the dedup window, so repeated queries for the
+same outbreak never trigger repeated SMS.
+
+Each queue remembers the events it has accepted, so repeated queries in
+one process are dropped in memory without touching the database. The
+worker then claims the window in the outbreak_alerts table with one
+atomic upsert just before sending, so it holds across every worker
+process sharing the database and request threads never wait on a write.
+"""
+import os
+import queue
+import threading
+import time
+
+from db import get_db
+
+OUTBREAK_DEDUP_WINDOW = float(os.environ.get('OUTBREAK_DEDUP_WINDOW', str(24 * 60 * 60)))
+OUTBREAK_QUEUE_SIZE = int(os.environ.get('OUTBREAK_QUEUE_SIZE', '1000'))
+
+
+class OutbreakAlertQueue:
+    def __init__(self, handler, dedup_window=OUTBREAK_DEDUP_WINDOW, maxsize=OUTBREAK_QUEUE_SIZE):
+        self._handler = handler
+        self._dedup_window = dedup_window
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._last_enqueued = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def start(self):
+        """Start the worker thread if it is not already running"""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='outbreak-alerts', daemon=True)
+                self._worker.start()
+
+    def _claim(self, location, period, now):
+        """Claim the window for (location, period); returns the time of the claim that holds it"""
+        with get_db() as conn, conn:
+            conn.execute("""INSERT INTO outbreak_alerts (location, period, claimed_at) VALUES (?, ?, ?)
+                            ON CONFLICT (location, period) DO UPDATE SET claimed_at = excluded.claimed_at
+                            WHERE outbreak_alerts.claimed_at <= excluded.claimed_at - ?""",
+                         (location, period, now, self._dedup_window))
+            return conn.execute("SELECT claimed_at FROM outbreak_alerts WHERE location = ? AND period = ?",
+                                (location, period)).fetchone()[0]
+
+    def enqueue(self, location, period, cases):
+        """Queue an outbreak event; returns False if deduplicated or dropped"""
+        now = time.time()
+        key = (location, period)
+        with self._lock:
+            last = self._last_enqueued.get(key)
+            if last is not None and now - last < self._dedup_window:
+                return False
+            self._last_enqueued[key] = now
+
+            # Forget keys whose window has passed so the table stays small
+            if len(self._last_enqueued) > 10 * OUTBREAK_QUEUE_SIZE:
+                self._last_enqueued = {
+                    k: t for k, t in self._last_enqueued.items() if now - t < self._dedup_window
+                }
+
+        try:
+            self._queue.put_nowait((location, period, cases))
+        except queue.Full:
+            print(f"Outbreak queue full, dropping alert for {location} {period}")
+            with self._lock:
+                self._last_enqueued.pop(key, None)
+            return False
+
+        self.start()
+        return True
+
+    def depth(self):
+        """Number of events waiting to be sent"""
+        return self._queue.qsize()
+
+    def join(self):
+        """Block until every queued event has been handled"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            location, period, cases = self._queue.get()
+            try:
+                now = time.time()
+                claimed_at = self._claim(location, period, now)
+                if claimed_at != now:
+                    # Another process sent this outbreak inside the window
+                    with self._lock:
+                        self._last_enqueued[(location, period)] = claimed_at
+                    continue
+                self._handler(location, cases)
+            except Exception as e:
+                print(f"Error sending outbreak alert for {location} {period}: {str(e)}")
+            finally:
+                self._queue.task_done()
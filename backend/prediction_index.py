@@ -0,0 +1,184 @@
+"""Constant-time lookup of actual and forecast case counts.
+
+The index is a dense NumPy grid with one row per location and one column
+per calendar month, built once from the data and forecasts. Lookups are
+a dict access plus two array reads, independent of the size of the data.
+Forecast prediction intervals are stored alongside as float32 grids, and
+a KD-tree of ward coordinates (spatial_index.WardTree) resolves
+latitude/longitude to the nearest wards.
+An index is never mutated after it is built; retraining builds a new one
+and swaps the reference.
+
+save() writes the grids to a compact .npz serving artifact that load()
+reads back in milliseconds, using nothing heavier than NumPy and
+scipy's KD-tree.
+"""
+import os
+import tempfile
+
+import numpy as np
+
+from spatial_index import WardTree
+
+MONTH_MAPPING = {
+    'January': 1, 'February': 2, 'March': 3, 'April': 4,
+    'May': 5, 'June': 6, 'July': 7, 'August': 8,
+    'September': 9, 'October': 10, 'November': 11, 'December': 12
+}
+
+# Bump whenever the arrays written by PredictionIndex.save() change
+SERVING_FORMAT_VERSION = 1
+
+
+def month_ordinal(year, month):
+    """Months since year 0, so consecutive months are consecutive integers"""
+    return year * 12 + (month - 1)
+
+
+class PredictionIndex:
+    def __init__(self, locations, actual_start, actuals, forecast_starts, forecast_lengths,
+                 forecast_values, coordinates=None, forecast_lower=None, forecast_upper=None):
+        self.locations = list(locations)
+        # location -> (latitude, longitude), for locations with coordinates in the data
+        self.coordinates = coordinates or {}
+        # Built here rather than on first use, so it is ready before serve.py's
+        # gc.freeze() and shared copy-on-write by forked workers
+        self.wards = WardTree(self.coordinates)
+        self._location_ids = {location: i for i, location in enumerate(self.locations)}
+        self._actual_start = actual_start
+        self._actuals = actuals
+        self._forecast_starts = forecast_starts
+        self._forecast_lengths = forecast_lengths
+        self._forecast_values = forecast_values
+        self._forecast_lower = forecast_lower
+        self._forecast_upper = forecast_upper
+
+    @classmethod
+    def build(cls, df, forecasts):
+        """Build the index from the case data and per-location forecast frames"""
+        locations = df['Location'].unique().tolist()
+        location_ids = {location: i for i, location in enumerate(locations)}
+
+        if 'MonthIndex' in df.columns:
+            ordinals = df['MonthIndex'].to_numpy(dtype=np.int64)
+        else:
+            months = df['Month']
+            if months.dtype == object:
+                months = months.map(MONTH_MAPPING)
+            ordinals = month_ordinal(df['Year'].to_numpy(dtype=np.int64), months.to_numpy(dtype=np.int64))
+        rows = df['Location'].map(location_ids).to_numpy(dtype=np.int64)
+
+        actual_start = int(ordinals.min()) if len(ordinals) else 0
+        width = int(ordinals.max()) - actual_start + 1 if len(ordinals) else 0
+        actuals = np.full((len(locations), width), np.nan)
+        # Reverse so the first row for a (location, month) wins, as in the CSV order
+        actuals[rows[::-1], ordinals[::-1] - actual_start] = df['Cases'].to_numpy(dtype=float)[::-1]
+
+        horizon = max((len(frame) for frame in forecasts.values()), default=0)
+        forecast_starts = np.full(len(locations), -1, dtype=np.int64)
+        forecast_lengths = np.zeros(len(locations), dtype=np.int64)
+        forecast_values = np.full((len(locations), horizon), np.nan)
+        forecast_lower = np.full((len(locations), horizon), np.nan, dtype=np.float32)
+        forecast_upper = np.full((len(locations), horizon), np.nan, dtype=np.float32)
+        for location, frame in forecasts.items():
+            i = location_ids.get(location)
+            if i is None or frame.empty:
+                continue
+            first = frame.index[0]
+            forecast_starts[i] = month_ordinal(first.year, first.month)
+            forecast_lengths[i] = len(frame)
+            forecast_values[i, :len(frame)] = frame['Predicted Cases'].to_numpy(dtype=float)
+            if 'Lower Bound' in frame.columns:
+                forecast_lower[i, :len(frame)] = frame['Lower Bound'].to_numpy(dtype=np.float32)
+                forecast_upper[i, :len(frame)] = frame['Upper Bound'].to_numpy(dtype=np.float32)
+
+        coordinates = {}
+        if 'Latitude' in df.columns and 'Longitude' in df.columns:
+            means = df.groupby('Location', sort=False, observed=True)[['Latitude', 'Longitude']].mean().dropna()
+            coordinates = {
+                location: (round(float(row.Latitude), 6), round(float(row.Longitude), 6))
+                for location, row in means.iterrows()
+            }
+
+        return cls(locations, actual_start, actuals, forecast_starts, forecast_lengths, forecast_values,
+                   coordinates, forecast_lower, forecast_upper)
+
+    def save(self, path, version):
+        """Write the index and the data version it was built from to an .npz file"""
+        coordinate_locations = list(self.coordinates)
+        arrays = {
+            'format_version': np.array(SERVING_FORMAT_VERSION),
+            'version': np.array(version),
+            'locations': np.array(self.locations, dtype=str),
+            'actual_start': np.array(self._actual_start),
+            'actuals': self._actuals,
+            'forecast_starts': self._forecast_starts,
+            'forecast_lengths': self._forecast_lengths,
+            'forecast_values': self._forecast_values,
+            'forecast_lower': self._forecast_lower,
+            'forecast_upper': self._forecast_upper,
+            'coordinate_locations': np.array(coordinate_locations, dtype=str),
+            'coordinates': np.array([self.coordinates[location] for location in coordinate_locations],
+                                    dtype=float).reshape(-1, 2),
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save(); returns (index, version)"""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format_version']) != SERVING_FORMAT_VERSION:
+                raise ValueError(f"Unsupported serving artifact format in {path}")
+            coordinates = {
+                str(location): (float(latitude), float(longitude))
+                for location, (latitude, longitude) in zip(data['coordinate_locations'], data['coordinates'])
+            }
+            index = cls([str(location) for location in data['locations']], int(data['actual_start']),
+                        data['actuals'], data['forecast_starts'], data['forecast_lengths'],
+                        data['forecast_values'], coordinates, data['forecast_lower'], data['forecast_upper'])
+            return index, str(data['version'])
+
+    def has_location(self, location):
+        return location in self._location_ids
+
+    def lookup(self, location, year, month):
+        """Return the actual or forecast cases for a location and month.
+
+        Actual data wins over forecasts. Months outside the forecast range
+        resolve to the nearest forecast month. Forecasts with an interval
+        also carry "lower" and "upper" bounds (never below zero). Returns
+        None for unknown locations.
+        """
+        i = self._location_ids.get(location)
+        if i is None:
+            return None
+
+        # Python ints throughout: a far-off year would overflow int64 arithmetic
+        ordinal = month_ordinal(int(year), int(month))
+        column = ordinal - int(self._actual_start)
+        if 0 <= column < self._actuals.shape[1]:
+            value = self._actuals[i, column]
+            if not np.isnan(value):
+                return {"prediction": int(value), "type": "actual"}
+
+        start = int(self._forecast_starts[i])
+        if start >= 0:
+            step = min(max(ordinal - start, 0), int(self._forecast_lengths[i]) - 1)
+            value = self._forecast_values[i, step]
+            if not np.isnan(value):
+                result = {"prediction": int(value), "type": "forecast"}
+                if self._forecast_lower is not None and not np.isnan(self._forecast_upper[i, step]):
+                    result["lower"] = max(int(round(float(self._forecast_lower[i, step]))), 0)
+                    result["upper"] = max(int(round(float(self._forecast_upper[i, step]))), 0)
+                return result
+
+        return {"prediction": 0, "type": "error"}
@@ -0,0 +1,49 @@
+"""Bounded in-process LRU cache for serialized API responses.
+
+Keys always include the data version of the snapshot a response was
+built from, so an entry can never be served for different data, even if
+a request built on the old snapshot finishes after a swap. Callers also
+clear the caches when a new snapshot is published, so stale entries
+don't linger until they are evicted.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '4096'))
+
+cache_requests = metrics.counter(
+    'forecast_cache_requests_total', "Lookups in the forecast caches by cache and result", ['cache', 'result'])
+
+
+class LRUCache:
+    def __init__(self, name, maxsize=RESPONSE_CACHE_SIZE):
+        self.name = name
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version, key):
+        """Return the cached value, or None on a miss"""
+        with self._lock:
+            value = self._entries.get((version, key))
+            if value is not None:
+                self._entries.move_to_end((version, key))
+        cache_requests.inc(cache=self.name, result='miss' if value is None else 'hit')
+        return value
+
+    def put(self, version, key, value):
+        with self._lock:
+            self._entries[(version, key)] = value
+            self._entries.move_to_end((version, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
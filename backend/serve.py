@@ -0,0 +1,20 @@
+"""Fast-start WSGI entry point that serves precomputed forecasts.
+
+Unlike wsgi.py this never loads the case data or fits models at boot.
+The prediction index saved by the last full load (SERVING_ARTIFACT) is
+read instead, so the process answers /api/locations and /api/predict
+within a fraction of a second and never imports pandas or statsmodels
+unless an ingest asks for a retrain. Without an artifact it falls back
+to a full load.
+
+    gunicorn -c gunicorn.conf.py serve:app
+"""
+import gc
+
+import app as dengue_app
+
+dengue_app.load_serving()
+
+gc.freeze()
+
+app = dengue_app.app
@@ -0,0 +1,134 @@
+"""Fast2SMS client shared by every code path that sends SMS.
+
+All requests go through one pooled HTTP session with a timeout, and
+bulk sends use the comma-separated `numbers` field of the bulkV2 API so
+one message body reaches many subscribers in a single request.
+"""
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+FAST2SMS_URL = os.environ.get('FAST2SMS_URL', 'https://www.fast2sms.com/dev/bulkV2')
+SMS_TIMEOUT = float(os.environ.get('SMS_TIMEOUT', '10'))
+# Should be at least SMS_CONCURRENCY so concurrent sends never wait on the pool
+SMS_POOL_SIZE = int(os.environ.get('SMS_POOL_SIZE', '16'))
+
+sms_request_seconds = metrics.histogram(
+    'sms_request_duration_seconds', "Fast2SMS request latency", ['outcome'])
+sms_requests = metrics.counter(
+    'sms_requests_total', "Fast2SMS requests by outcome and Fast2SMS status code",
+    ['outcome', 'status_code'])
+sms_recipients = metrics.counter(
+    'sms_recipients_total', "Phone numbers included in Fast2SMS requests", ['outcome'])
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _reset_session_after_fork():
+    # Pooled sockets inherited from the parent would be shared with it
+    global _session
+    _session = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_session_after_fork)
+
+
+def get_session():
+    """Return the process-wide pooled HTTP session"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SMS_POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def format_phone_number(phone):
+    """Format phone number for Indian numbers"""
+    # Remove any non-numeric characters
+    phone = ''.join(filter(str.isdigit, phone))
+
+    # Assuming Indian phone numbers: anything before the last 10 digits is a
+    # country code (91) or trunk prefix (0). A 10-digit number that happens
+    # to start with 91 is left alone.
+    return phone[-10:] if len(phone) > 10 else phone
+
+
+def send_sms(phone_number, message):
+    """Send SMS using Fast2SMS v3 API"""
+    return send_bulk_sms([phone_number], message)
+
+
+def send_bulk_sms(phone_numbers, message):
+    """Send one message to many numbers in a single Fast2SMS request"""
+    start = time.perf_counter()
+    result = _post_bulk_sms(phone_numbers, message)
+    outcome = 'success' if result['success'] else 'failure'
+    sms_request_seconds.observe(time.perf_counter() - start, outcome=outcome)
+    sms_requests.inc(outcome=outcome, status_code=result.pop('status_code'))
+    sms_recipients.inc(len(phone_numbers), outcome=outcome)
+    return result
+
+
+def _post_bulk_sms(phone_numbers, message):
+    """Make the Fast2SMS request; the result also carries a status_code label"""
+    api_key = os.environ.get('FAST2SMS_API_KEY')
+    if not api_key:
+        # The app starts without a key; don't send requests that can only fail
+        return {'success': False, 'error': "FAST2SMS_API_KEY is not set", 'status_code': 'unconfigured'}
+
+    try:
+        formatted_phones = ','.join(format_phone_number(phone) for phone in phone_numbers)
+
+        # Truncate message if it's too long (SMS limit is typically 160 characters)
+        if len(message) > 160:
+            message = message[:157] + "..."
+
+        # v3 API parameters - authorization should be in headers
+        headers = {
+            "authorization": api_key,
+            "accept": "application/json",
+            "content-type": "application/x-www-form-urlencoded"
+        }
+
+        # Payload for v3 API
+        payload = {
+            "route": "q",  # Quick SMS route
+            "message": message,
+            "flash": 0,
+            "numbers": formatted_phones
+        }
+
+        response = get_session().post(FAST2SMS_URL, data=payload, headers=headers, timeout=SMS_TIMEOUT)
+        result = response.json()
+
+        # Check if SMS was sent successfully
+        if result.get('return') == True:
+            print(f"SMS sent successfully to {len(phone_numbers)} numbers. Response: {result}")
+            return {'success': True, 'message_id': result.get('request_id', 'N/A'),
+                    'status_code': result.get('status_code', response.status_code)}
+        else:
+            print(f"Fast2SMS error: {result}")
+            error_message = result.get('message', 'Unknown error')
+            # More specific error handling
+            if result.get('status_code') == 412:
+                error_message = "Authentication failed. Please check your API key."
+            elif result.get('status_code') == 990:
+                error_message = "API configuration error. Please check Fast2SMS v3 documentation."
+            return {'success': False, 'error': error_message,
+                    'status_code': result.get('status_code', response.status_code)}
+
+    except Exception as e:
+        print(f"Error sending SMS: {str(e)}")
+        return {'success': False, 'error': str(e), 'status_code': type(e).__name__}
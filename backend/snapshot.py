@@ -0,0 +1,54 @@
+"""Immutable bundle of everything the prediction endpoints serve from.
+
+The case data, fitted model params, forecasts, lookup index, model
+config (including any per-location selection) and data version are
+built together and published as one object with a single reference
+assignment. Readers grab the current snapshot once per request
+and use only that, so they never block and never see models from one
+data version next to forecasts from another.
+
+A snapshot loaded from the serving artifact (app.load_serving()) has
+only the index: df is None and models and forecasts are empty.
+
+app.build_serving_snapshot() uses the serving artifact only while it is
+current: its version is the model store key of the data and config it
+was built from, so it must match the key of today's DATA_FILE and model
+config (selection included). Otherwise a full snapshot is built.
+
+app.get_snapshot() loads the first snapshot once, with concurrent first
+requests waiting for that single load instead of each training their
+own copy. After that it never blocks, apart from the request that
+reloads after another process changed the data.
+
+source is the (inode, size, mtime) stamp of the file the snapshot was
+read from: the CSV for a full snapshot, the serving artifact for an
+index-only one. Every worker process holds its own snapshot, so
+app.reload_if_changed() compares source with the file on disk to pick
+up data another worker ingested. A full snapshot reloads with the
+models the ingesting process stored for the new data. While another
+thread holds app.snapshot_lock the current snapshot keeps being served.
+"""
+from types import MappingProxyType
+
+
+class ModelSnapshot:
+    __slots__ = ('df', 'models', 'forecasts', 'index', 'version', 'config', 'source')
+
+    def __init__(self, df, models, forecasts, index, version, config, source=None):
+        # Read-only views so nobody can update a published snapshot in place
+        object.__setattr__(self, 'df', df)
+        object.__setattr__(self, 'models', MappingProxyType(dict(models)))
+        object.__setattr__(self, 'forecasts', MappingProxyType(dict(forecasts)))
+        object.__setattr__(self, 'index', index)
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'config', MappingProxyType(dict(config)))
+        object.__setattr__(self, 'source', source)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ModelSnapshot is immutable; build a new one instead")
+
+    def __delattr__(self, name):
+        raise AttributeError("ModelSnapshot is immutable; build a new one instead")
+
+    def __repr__(self):
+        return f"ModelSnapshot(version={self.version!r}, locations={len(self.index.locations)})"
@@ -0,0 +1,51 @@
+"""Nearest-ward lookup by latitude and longitude.
+
+Ward centroids are converted to points on the unit sphere and put in a
+KD-tree once, when a prediction index is built or loaded. A query
+costs O(log n) in the number of wards. Because the tree works on 3-D chords
+rather than raw degrees, the nearest ward is the same one a great-circle
+distance would pick.
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Distances below this count as this far, so a query right on a ward's
+# centroid doesn't give it infinite weight
+MIN_WEIGHT_DISTANCE_KM = 0.05
+
+
+def _unit_vectors(latitudes, longitudes):
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+class WardTree:
+    def __init__(self, coordinates):
+        """coordinates maps location -> (latitude, longitude)"""
+        from scipy.spatial import cKDTree
+
+        self.locations = list(coordinates)
+        points = [coordinates[location] for location in self.locations]
+        self._tree = cKDTree(_unit_vectors(*zip(*points))) if points else None
+
+    def __len__(self):
+        return len(self.locations)
+
+    def nearest(self, latitude, longitude, k=1):
+        """Up to k (location, distance_km) pairs, nearest first"""
+        if self._tree is None:
+            return []
+        k = min(k, len(self.locations))
+        chords, ids = self._tree.query(_unit_vectors([latitude], [longitude])[0], k=k)
+        chords, ids = np.atleast_1d(chords), np.atleast_1d(ids)
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chords / 2, 1.0))
+        return [(self.locations[i], float(distance)) for i, distance in zip(ids, distances)]
+
+
+def inverse_distance_weights(distances, power=2):
+    """Normalized weights proportional to 1 / distance ** power"""
+    distances = np.maximum(np.asarray(distances, dtype=float), MIN_WEIGHT_DISTANCE_KM)
+    weights = 1.0 / distances ** power
+    return weights / weights.sum()
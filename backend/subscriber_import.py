@@ -0,0 +1,129 @@
+"""Subscriber validation and bulk import.
+
+validate_subscriber() holds the rules /api/subscribe applies, so single
+sign-ups and bulk imports accept exactly the same records. A bulk import
+reads CSV or NDJSON rows one at a time; like a single sign-up, each
+mobile is validated as given and then normalized with
+format_phone_number(). Rows are upserted by email in batches of
+SUBSCRIBER_IMPORT_BATCH_SIZE, one executemany() and one transaction per
+batch. Rows that fail validation are skipped and reported with their row
+number; they never abort the import.
+
+Imported subscribers get no welcome message or alert log entry.
+"""
+import csv
+import json
+import os
+
+from db import get_db, select_in
+from sms_gateway import format_phone_number
+
+SUBSCRIBER_IMPORT_BATCH_SIZE = int(os.environ.get('SUBSCRIBER_IMPORT_BATCH_SIZE', '5000'))
+# Row errors listed in an import report; later ones are only counted
+MAX_IMPORT_ERRORS = 1000
+
+VALID_FREQUENCIES = ['daily', 'weekly', 'monthly']
+
+# Columns read by an import and written by an export, so the two round-trip
+IMPORT_COLUMNS = ['name', 'email', 'mobile', 'location', 'alert_frequency']
+
+
+def validate_subscriber(data):
+    """Return the error message for a subscription, or None if it is valid"""
+    name, email, mobile, location = (data.get(key) for key in ('name', 'email', 'mobile', 'location'))
+
+    if not all([name, email, mobile, location]):
+        return "All fields are required"
+    if '@' not in email:
+        return "Invalid email format"
+    # Basic mobile number validation
+    if not mobile.isdigit() or len(mobile) < 10:
+        return "Invalid mobile number"
+    if data.get('alert_frequency', 'weekly') not in VALID_FREQUENCIES:
+        return "Invalid alert frequency"
+    return None
+
+
+def read_rows(lines, fmt):
+    """Yield (row_number, dict or exception) for each CSV or NDJSON record in lines"""
+    if fmt == 'csv':
+        # Row 1 is the header
+        for number, row in enumerate(csv.DictReader(lines), start=2):
+            yield number, row
+    elif fmt == 'ndjson':
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, e
+                continue
+            yield number, row if isinstance(row, dict) else ValueError("Expected a JSON object")
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _record(row):
+    """Subscriber record from an import row, with surrounding whitespace stripped"""
+    record = {key: str(row[key]).strip() if row.get(key) is not None else '' for key in IMPORT_COLUMNS}
+    record['alert_frequency'] = record['alert_frequency'] or 'weekly'
+    return record
+
+
+def _upsert(conn, records):
+    """Insert or update one batch in a single transaction; returns how many were new"""
+    existing = {email for (email,) in select_in(conn, 'SELECT email FROM subscribers WHERE email IN ({})', records)}
+    with conn:
+        conn.executemany("""INSERT INTO subscribers (name, email, mobile, location, alert_frequency)
+                            VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT (email) DO UPDATE SET
+                                name = excluded.name, mobile = excluded.mobile,
+                                location = excluded.location, alert_frequency = excluded.alert_frequency""",
+                         [tuple(record[key] for key in IMPORT_COLUMNS) for record in records.values()])
+    return len(records) - len(existing)
+
+
+def import_subscribers(rows, batch_size=None, dry_run=False):
+    """Validate and upsert (row_number, row) pairs from read_rows().
+
+    Existing subscribers (matched by email) get the imported name, mobile,
+    location and frequency. Within one batch the last row for an email
+    wins. With dry_run nothing is written. Returns a report with counts
+    and the first MAX_IMPORT_ERRORS row errors.
+    """
+    batch_size = batch_size or SUBSCRIBER_IMPORT_BATCH_SIZE
+    report = {'received': 0, 'inserted': 0, 'updated': 0, 'failed': 0, 'errors': []}
+
+    def fail(number, message):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_IMPORT_ERRORS:
+            report['errors'].append({'row': number, 'error': message})
+
+    with get_db() as conn:
+        batch = {}
+        for number, row in rows:
+            report['received'] += 1
+            if isinstance(row, Exception):
+                fail(number, f"Invalid row: {str(row)}")
+                continue
+            record = _record(row)
+            error = validate_subscriber(record)
+            if error:
+                fail(number, error)
+                continue
+            record['mobile'] = format_phone_number(record['mobile'])
+            batch[record['email']] = record
+
+            if len(batch) >= batch_size:
+                if not dry_run:
+                    inserted = _upsert(conn, batch)
+                    report['inserted'] += inserted
+                    report['updated'] += len(batch) - inserted
+                batch = {}
+        if batch and not dry_run:
+            inserted = _upsert(conn, batch)
+            report['inserted'] += inserted
+            report['updated'] += len(batch) - inserted
+
+    return report
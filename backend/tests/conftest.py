@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """The Flask app module, with its database and stores in a scratch dir"""
+    workdir = tmp_path_factory.mktemp('app')
+    # The app reads these at import, so point everything at the scratch dir first
+    os.environ.setdefault('FAST2SMS_API_KEY', 'test-key')
+    os.environ['DB_NAME'] = str(workdir / 'test.db')
+    os.environ['MODEL_STORE_DIR'] = str(workdir / 'model_store')
+    os.environ['DATA_STORE_DIR'] = str(workdir / 'data_store')
+    os.environ['SCHEDULER_LOCK_FILE'] = str(workdir / 'scheduler.lock')
+    import app
+    return app
+
+
+@pytest.fixture(scope='session')
+def cases(app):
+    """The bundled case data"""
+    import pandas as pd
+    return pd.read_csv(os.path.join(BACKEND_DIR, app.DATA_FILE))
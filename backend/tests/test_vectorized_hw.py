@@ -0,0 +1,31 @@
+import numpy as np
+
+from training import prepare_series, train_locations
+from vectorized_hw import PARITY_TOLERANCE, fit_batch, train_vectorized
+
+SMOOTHING = ('smoothing_level', 'smoothing_trend', 'smoothing_seasonal')
+
+
+def test_matches_statsmodels_on_bundled_data(app, cases):
+    series = prepare_series(cases)
+    config = app.MODEL_CONFIG
+    expected_models, expected, _ = train_locations(series, config, workers=1)
+    models, forecasts, report = train_vectorized(series, config)
+
+    assert report['failed'] == []
+    for location, forecast in expected.items():
+        gap = np.abs(forecasts[location]['Predicted Cases'].to_numpy()
+                     - forecast['Predicted Cases'].to_numpy()).max()
+        assert gap <= PARITY_TOLERANCE * series[location].mean(), location
+        for name in SMOOTHING:
+            assert np.isclose(models[location][name], expected_models[location][name], rtol=1e-6, atol=1e-9), \
+                (location, name)
+
+
+def test_fit_does_not_depend_on_batch(cases):
+    series = prepare_series(cases)
+    y = np.vstack([location_series.to_numpy(dtype=float) for location_series in series.values()])
+    together, _, _ = fit_batch(y)
+    alone, _, _ = fit_batch(y[2:3])
+    assert all(together[2][name] == alone[0][name] for name in SMOOTHING)
+    assert np.array_equal(together[2]['initial_seasons'], alone[0]['initial_seasons'])
@@ -0,0 +1,253 @@
+"""Training engine that fits one Holt-Winters model per location.
+
+Location fits are independent, so they are fanned out over a process
+pool. Every fit reports its own timing and outcome; a location that fails
+to fit is recorded in the report instead of aborting the whole run.
+
+config is the model config shared by every location; a 'selection' entry
+(written offline by model_selection.py) maps locations to the trend,
+seasonal and Box-Cox settings that won their backtest, or to the climate
+covariate model (climate_model.py), which app.train_models() fits
+separately.
+
+Forecast frames carry prediction intervals ('Lower Bound', 'Upper Bound')
+next to 'Predicted Cases', simulated from the fitted model at training
+time so requests never have to simulate.
+"""
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from prediction_index import MONTH_MAPPING
+
+# 0 means one worker per CPU, 1 disables the pool entirely
+TRAINING_WORKERS = int(os.environ.get('TRAINING_WORKERS', '0'))
+
+
+def prepare_series(df):
+    """Build a monthly case series for every location in df"""
+    df = df.copy()
+    if 'MonthIndex' in df.columns:
+        month_index = df['MonthIndex'].to_numpy(dtype=np.int64)
+    else:
+        months = df['Month'].map(MONTH_MAPPING) if df['Month'].dtype == object else df['Month']
+        month_index = df['Year'].to_numpy(dtype=np.int64) * 12 + months.to_numpy(dtype=np.int64) - 1
+
+    df['Date'] = pd.to_datetime(pd.DataFrame(
+        {'year': month_index // 12, 'month': month_index % 12 + 1, 'day': 1}, index=df.index))
+    df.sort_values(['Location', 'Date'], inplace=True)
+
+    series_by_location = {}
+    for location, location_df in df.groupby('Location', sort=False, observed=True):
+        series_by_location[location] = (location_df.set_index('Date')['Cases']
+                                         .astype(float)
+                                         .replace(0, np.nan)
+                                         .bfill()
+                                         .resample('ME')
+                                         .mean()
+                                         .interpolate(method='linear'))
+    return series_by_location
+
+
+# Settings a model selection may override per location
+SELECTABLE_KEYS = ('model', 'trend', 'damped_trend', 'seasonal', 'use_boxcox')
+
+
+def location_config(config, location):
+    """config with the location's selected settings applied, if it has any"""
+    overrides = config.get('selection', {}).get(location)
+    if not overrides:
+        return config
+    return dict(config, **{key: overrides[key] for key in SELECTABLE_KEYS if key in overrides})
+
+
+def build_model(location_series, config, params=None):
+    """ExponentialSmoothing for config; with params, its initial states are held fixed"""
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    trend, seasonal = config['trend'], config['seasonal']
+    kwargs = {
+        'trend': trend,
+        'damped_trend': bool(trend) and config.get('damped_trend', False),
+        'seasonal': seasonal,
+        'seasonal_periods': config['seasonal_periods'] if seasonal else None,
+        'use_boxcox': config['use_boxcox'],
+    }
+    if params is None:
+        return ExponentialSmoothing(location_series, initialization_method=config['initialization_method'],
+                                    **kwargs)
+
+    if config['use_boxcox']:
+        kwargs['use_boxcox'] = params['lamda']
+    return ExponentialSmoothing(
+        location_series,
+        initialization_method='known',
+        initial_level=params['initial_level'],
+        initial_trend=params['initial_trend'] if trend else None,
+        initial_seasonal=params['initial_seasons'] if seasonal else None,
+        **kwargs
+    )
+
+
+def simulated_interval(fitted_model, forecast, config):
+    """Prediction interval around forecast from simulated future paths.
+
+    Paths are simulated from the end of the data with resampled in-sample
+    errors; their quantiles are taken relative to the simulated mean, so
+    the interval is centred the same way as the (bias-adjusted) forecast.
+    Returns float32 (lower, upper) arrays.
+
+    The errors are resampled here with a fixed seed rather than by
+    simulate(random_errors='bootstrap'), which ignores random_state and
+    draws from the global NumPy RNG; that made intervals (and risk levels)
+    differ between retrains and between worker processes.
+    """
+    level = config['interval_level']
+    repetitions = config['interval_simulations']
+    # Residuals on the scale the model is fit on, as simulate() computes them
+    observed = np.asarray(fitted_model.model.endog, dtype=float)
+    fitted = np.asarray(fitted_model.fittedvalues, dtype=float)
+    if config['use_boxcox']:
+        from scipy.special import boxcox
+        lamda = fitted_model.params['lamda']
+        observed, fitted = boxcox(observed, lamda), boxcox(fitted, lamda)
+    errors = np.random.default_rng(0).choice(observed - fitted, size=(len(forecast), repetitions), replace=True)
+    simulations = np.asarray(fitted_model.simulate(
+        nsimulations=len(forecast), repetitions=repetitions,
+        error='add', anchor='end', random_errors=errors))
+    simulations = simulations.reshape(len(forecast), -1)
+    quantiles = np.quantile(simulations, [(1 - level) / 2, (1 + level) / 2], axis=1)
+    offsets = quantiles - simulations.mean(axis=1)
+    forecast = np.asarray(forecast, dtype=float)
+    return (forecast + offsets[0]).astype(np.float32), (forecast + offsets[1]).astype(np.float32)
+
+
+def _run_fit(location, location_series, config, build_and_fit):
+    """Fit via build_and_fit(), forecast the horizon and time the whole step"""
+    start = time.perf_counter()
+    result = {'location': location, 'params': None, 'forecast': None,
+              'fit_seconds': 0.0, 'error': None, 'warnings': []}
+
+    try:
+        if len(location_series) < 12:
+            result['warnings'].append("Limited data points, accuracy may be low")
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            fitted_model = build_and_fit()
+
+            future_dates = pd.date_range(start=location_series.index[-1] + pd.DateOffset(months=1),
+                                         periods=config['forecast_horizon'], freq='ME')
+            future_forecast = fitted_model.forecast(steps=len(future_dates))
+            lower, upper = simulated_interval(fitted_model, future_forecast, config)
+        result['warnings'].extend(str(w.message) for w in caught)
+
+        result['params'] = fitted_model.params
+        result['forecast'] = pd.DataFrame({'Predicted Cases': future_forecast,
+                                           'Lower Bound': lower,
+                                           'Upper Bound': upper}, index=future_dates)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {str(e)}"
+
+    result['fit_seconds'] = time.perf_counter() - start
+    return result
+
+
+def fit_location(location, location_series, config):
+    """Fit a single location and return its params, forecast and timing"""
+    config = location_config(config, location)
+
+    def build_and_fit():
+        model = build_model(location_series, config)
+        return model.fit(optimized=True, remove_bias=config['remove_bias'])
+
+    return _run_fit(location, location_series, config, build_and_fit)
+
+
+def reforecast_location(location, location_series, params, config):
+    """Re-run a fitted model over an extended series without re-optimizing.
+
+    The smoothing parameters and initial states from params are held fixed,
+    so this only filters the new observations through the existing model
+    and forecasts from the new end of the series. Returns the same result
+    shape as fit_location().
+    """
+    config = location_config(config, location)
+
+    def build_and_fit():
+        model = build_model(location_series, config, params)
+        return model.fit(
+            smoothing_level=params['smoothing_level'],
+            smoothing_trend=params['smoothing_trend'] if model.trend else None,
+            smoothing_seasonal=params['smoothing_seasonal'] if model.seasonal else None,
+            damping_trend=params['damping_trend'] if model.damped_trend else None,
+            optimized=False,
+            remove_bias=config['remove_bias']
+        )
+
+    return _run_fit(location, location_series, config, build_and_fit)
+
+
+def record_results(results, models, forecasts, report):
+    """Add fit_location() results to models, forecasts and the training report.
+
+    Failed locations are listed in report['failed'] and leave models and
+    forecasts untouched.
+    """
+    for result in results:
+        location = result['location']
+        report['locations'][location] = {
+            'fit_seconds': round(result['fit_seconds'], 4),
+            'status': 'failed' if result['error'] else 'ok',
+            'error': result['error'],
+            'warnings': result['warnings'],
+        }
+        if result['error']:
+            report['failed'].append(location)
+            continue
+        models[location] = result['params']
+        forecasts[location] = result['forecast']
+
+
+def train_locations(series_by_location, config, workers=None):
+    """Fit every location, in parallel when more than one worker is allowed.
+
+    Returns (models, forecasts, report). Failed locations are absent from
+    models/forecasts and listed in report['failed'].
+    """
+    if workers is None:
+        workers = TRAINING_WORKERS or os.cpu_count() or 1
+    workers = max(1, min(workers, len(series_by_location) or 1))
+
+    start = time.perf_counter()
+    results = []
+    if workers == 1:
+        for location, location_series in series_by_location.items():
+            results.append(fit_location(location, location_series, config))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(fit_location, location, location_series, config): location
+                for location, location_series in series_by_location.items()
+            }
+            for future in as_completed(futures):
+                location = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # The worker itself died (e.g. BrokenProcessPool)
+                    results.append({'location': location, 'params': None, 'forecast': None,
+                                    'fit_seconds': 0.0, 'error': f"{type(e).__name__}: {str(e)}",
+                                    'warnings': []})
+
+    models = {}
+    forecasts = {}
+    report = {'workers': workers, 'locations': {}, 'failed': []}
+    record_results(results, models, forecasts, report)
+
+    report['total_seconds'] = round(time.perf_counter() - start, 4)
+    return models, forecasts, report
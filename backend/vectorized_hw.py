@@ -0,0 +1,435 @@
+"""Vectorized additive Holt-Winters over many locations at once.
+
+An alternative to fitting one statsmodels ExponentialSmoothing per
+location that reproduces statsmodels' own fitting procedure, with the
+Holt-Winters recursions run once over all locations that share a date
+index instead of once per location:
+
+* initial level, trend and seasonals from the same heuristic as
+  initialization_method='estimated' (a 2 x m moving average over the
+  first cycles, then a line through its first ten values)
+* a brute-force search over statsmodels' grid of (alpha, beta, gamma),
+  grid points for all locations evaluated together in batched passes
+* SLSQP over all smoothing parameters and initial states, in statsmodels'
+  transformed space that enforces beta <= alpha and gamma <= 1 - alpha
+
+SLSQP is sequential, so each location still runs its own minimize(); the
+runs are kept in lockstep on threads and every round of objective values
+and finite-difference gradients (taken with scipy's own steps) is one
+batched pass over the recursions (_minimize_lockstep).
+
+statsmodels' SLSQP stops where its progress check is met, not at a true
+minimum of the flat sum-of-squares surface, and that point moves with
+last-bit differences in the starting values. So the recursions and the
+heuristic use statsmodels' operation order. On the bundled data the
+fitted params and forecasts are then bit-for-bit statsmodels' (checked
+with scipy 1.15 and 1.17); tests/test_vectorized_hw.py holds them within
+PARITY_TOLERANCE.
+
+The params dict matches statsmodels' additive/additive model, so the
+fitted params work with training.reforecast_location(). Prediction
+intervals use the closed-form forecast variance of the equivalent
+ETS(A,A,A) model instead of simulation.
+"""
+import threading
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# statsmodels' brute grid: 87 // (number of smoothing params) alphas
+BRUTE_STEPS = 87 // 3
+# Grid points x locations evaluated per pass of the brute search
+BRUTE_BATCH = 2 ** 14
+# Locations optimized in lockstep at once (one thread each)
+LOCKSTEP_BATCH = 256
+# statsmodels keeps alpha this far inside (0, 1)
+LOWER_BOUND = np.sqrt(np.finfo(float).eps)
+
+# Largest forecast difference from statsmodels, as a fraction of the
+# series mean, that the parity test and benchmark accept. The fits are
+# reproduced exactly, so this only leaves room for rounding.
+PARITY_TOLERANCE = 1e-6
+
+
+def _filter(y, alpha, beta, gamma, level, trend, seasons, keep_predictions=True):
+    """Run additive Holt-Winters over y.
+
+    y has shape (..., T); parameters and initial states broadcast against
+    the leading dimensions, seasons carries a trailing axis of length m.
+    Returns (one-step predictions, final states), or (sum of squared
+    one-step errors, final states) when keep_predictions is False so grid
+    searches don't hold a (candidates x locations x months) array.
+    The arithmetic follows statsmodels' holt_win_add_add_dam step for step.
+    """
+    m = seasons.shape[-1]
+    steps = y.shape[-1]
+    batch = np.broadcast_shapes(y.shape[:-1], np.shape(alpha), np.shape(level), seasons.shape[:-1])
+
+    level = np.broadcast_to(level, batch).astype(float)
+    trend = np.broadcast_to(trend, batch).astype(float)
+    seasons = [np.broadcast_to(seasons[..., i], batch).astype(float) for i in range(m)]
+    # Time-major so each step reads one contiguous slice
+    observations = np.ascontiguousarray(np.moveaxis(y, -1, 0))
+    alpha_c, beta_c, gamma_c = 1 - alpha, 1 - beta, 1 - gamma
+
+    if keep_predictions:
+        output = np.empty((steps,) + batch)
+    else:
+        output = np.zeros(batch)
+    for t in range(steps):
+        season = seasons[t % m]
+        observed = observations[t]
+        base = level + trend
+        if keep_predictions:
+            output[t] = base + season
+        else:
+            error = observed - (base + season)
+            output += error * error
+        new_level = (alpha * observed - alpha * season) + alpha_c * base
+        trend = beta * (new_level - level) + beta_c * trend
+        # statsmodels' forecasts drop the last observation's season update
+        if t < steps - 1:
+            seasons[t % m] = (gamma * observed - gamma * base) + gamma_c * season
+        level = new_level
+
+    if keep_predictions:
+        output = np.ascontiguousarray(np.moveaxis(output, 0, -1))
+    # Rotate so the next season to use is first
+    shift = steps % m
+    seasons = np.stack(seasons[shift:] + seasons[:shift], axis=-1)
+    return output, (level, trend, seasons)
+
+
+def _heuristic_init(y, m):
+    """Initial states as statsmodels' initialization_method='estimated' starts them"""
+    locations, steps = y.shape
+    min_obs = 10 + 2 * (m // 2)
+    cycles = max(min(5, steps // m), int(np.ceil(min_obs / m)))
+
+    # Centred 2 x m moving average, one column per location
+    first_cycles = pd.DataFrame(y[:, :m * cycles].T)
+    moving_average = first_cycles.rolling(m, center=True).mean()
+    if m % 2 == 0:
+        moving_average = moving_average.shift(-1).rolling(2).mean()
+
+    detrended = (first_cycles - moving_average).to_numpy().T
+    seasons = np.nanmean(detrended.reshape(locations, cycles, m), axis=1)
+    seasons -= seasons.mean(axis=1, keepdims=True)
+
+    # Line through the first ten moving-average values. One location at a
+    # time: a single matrix product over all of them rounds differently,
+    # and the optimizer turns last-bit differences into different fits.
+    head = moving_average.dropna().to_numpy()[:10]
+    exog = np.c_[np.ones(10), np.arange(10) + 1]
+    solve = np.linalg.pinv(exog)
+    coefficients = np.column_stack([solve.dot(head[:, [i]])[:, 0] for i in range(locations)])
+    return coefficients[0], coefficients[1], seasons
+
+
+def _brute_grid():
+    """statsmodels' brute-force (alpha, beta, gamma) points, in its order"""
+    step = 0.005
+    points = []
+    for alpha in np.linspace(step, 1 - step, BRUTE_STEPS):
+        betas = np.linspace(0.0, min(1.0, alpha), int(np.ceil(BRUTE_STEPS * np.sqrt(alpha))))
+        gammas = np.linspace(0.0, min(1.0, 1 - alpha), int(np.ceil(BRUTE_STEPS * np.sqrt(1 - alpha))))
+        both = np.stack(np.meshgrid(betas, gammas)).reshape(2, -1).T
+        points.append(np.column_stack([np.full(len(both), alpha), both]))
+    return np.vstack(points)
+
+
+def _brute_search(y, level, trend, seasons):
+    """Best grid point per location for the heuristic initial states"""
+    grid = _brute_grid()
+    locations = y.shape[0]
+    best = np.zeros(locations, dtype=int)
+    best_sse = np.full(locations, np.inf)
+    chunk = max(1, BRUTE_BATCH // locations)
+    for first in range(0, len(grid), chunk):
+        points = grid[first:first + chunk]
+        alpha, beta, gamma = (points[:, i, None] for i in range(3))
+        sse, _ = _filter(y, alpha, beta, gamma, level, trend, seasons, keep_predictions=False)
+        # Like statsmodels, NaN never wins and ties keep the earlier point
+        sse = np.where(np.isnan(sse), np.inf, sse)
+        winner = np.argmin(sse, axis=0)
+        winner_sse = sse[winner, np.arange(locations)]
+        improved = winner_sse < best_sse
+        best = np.where(improved, first + winner, best)
+        best_sse = np.where(improved, winner_sse, best_sse)
+    return grid[best]
+
+
+def _restrict(x):
+    """(alpha, beta, gamma) from statsmodels' unrestricted [0, 1] space"""
+    alpha = LOWER_BOUND + x[..., 0] * ((1 - LOWER_BOUND) - LOWER_BOUND)
+    beta = x[..., 1] * np.minimum(alpha, 1.0)
+    gamma = x[..., 2] * np.minimum(1.0 - alpha, 1.0)
+    return alpha, beta, gamma
+
+
+def _unrestrict(params):
+    """Inverse of _restrict(), after moving params strictly inside (0, 1)"""
+    params = np.where(params <= 0, 1e-4, params)
+    params = np.where(params >= 1, 1 - 1e-4, params)
+    alpha, beta, gamma = params.T
+    return np.column_stack([(alpha - LOWER_BOUND) / ((1 - LOWER_BOUND) - LOWER_BOUND),
+                            beta / np.minimum(alpha, 1.0),
+                            gamma / np.minimum(1.0 - alpha, 1.0)])
+
+
+def _difference_steps(x, lower, upper):
+    """Forward-difference steps scipy's SLSQP takes from x (2-point, abs_step).
+
+    Mirrors scipy.optimize._numdiff: a fixed absolute step, flipped or
+    shortened where it would leave the bounds, so gradients built from
+    these steps match scipy's to the bit.
+    """
+    step = np.sqrt(np.finfo(float).eps)
+    sign = (x >= 0).astype(float) * 2 - 1
+    h = np.where((x + step) - x == 0, step * sign * np.maximum(1.0, np.abs(x)), step)
+
+    lower_dist = x - lower
+    upper_dist = upper - x
+    moved = x + h
+    violated = (moved < lower) | (moved > upper)
+    fitting = np.abs(h) <= np.maximum(lower_dist, upper_dist)
+    h = np.where(violated & fitting, -h, h)
+    h = np.where((upper_dist >= lower_dist) & ~fitting, upper_dist, h)
+    return np.where((upper_dist < lower_dist) & ~fitting, -lower_dist, h)
+
+
+def _minimize_lockstep(objective, starts, bounds):
+    """SLSQP from every row of starts, batching the objective across runs.
+
+    Each run is an ordinary scipy minimize() on its own thread. Its
+    objective and finite-difference gradient post the points they need and
+    wait; once every unfinished run is waiting, objective(points, rows)
+    evaluates all of them in one call. Returns the OptimizeResults in row
+    order.
+    """
+    from scipy.optimize import minimize
+
+    lower = np.array([-np.inf if low is None else low for low, _ in bounds], dtype=float)
+    upper = np.array([np.inf if high is None else high for _, high in bounds], dtype=float)
+
+    lock = threading.Lock()
+    all_waiting = threading.Event()
+    answered = [threading.Event() for _ in starts]
+    pending = {}
+    values = [None] * len(starts)
+    running = set(range(len(starts)))
+    results = [None] * len(starts)
+    errors = []
+
+    def post(row, points):
+        with lock:
+            if points is None:
+                running.discard(row)
+            else:
+                pending[row] = points
+            if len(pending) == len(running):
+                all_waiting.set()
+
+    def run(row):
+        def evaluate(points):
+            post(row, points)
+            answered[row].wait()
+            answered[row].clear()
+            return values[row]
+
+        def fun(x):
+            return evaluate(np.array(x, dtype=float)[None])[0]
+
+        def jac(x):
+            x = np.array(x, dtype=float)
+            moved = x + np.diag(_difference_steps(x, lower, upper))
+            f = evaluate(np.vstack([x, moved]))
+            return (f[1:] - f[0]) / (moved.diagonal() - x)
+
+        try:
+            results[row] = minimize(fun, starts[row], jac=jac, method='SLSQP', bounds=bounds)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            post(row, None)
+
+    threads = [threading.Thread(target=run, args=(row,), daemon=True) for row in range(len(starts))]
+    for thread in threads:
+        thread.start()
+    while True:
+        all_waiting.wait()
+        with lock:
+            all_waiting.clear()
+            if not running:
+                break
+            rows = sorted(pending)
+            batches = [pending.pop(row) for row in rows]
+        sizes = [len(batch) for batch in batches]
+        owners = np.repeat(rows, sizes)
+        split = np.split(np.asarray(objective(np.vstack(batches), owners)), np.cumsum(sizes)[:-1])
+        for row, value in zip(rows, split):
+            values[row] = value
+            answered[row].set()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+def _optimize(y, level, trend, seasons, smoothing):
+    """statsmodels' SLSQP step for every location, batched in lockstep"""
+    m = seasons.shape[1]
+    bounds = [(0, 1)] * 3 + [(None, None)] * (2 + m)
+    starts = np.column_stack([_unrestrict(smoothing), level, trend, seasons])
+
+    def sum_of_squares(points, rows):
+        alpha, beta, gamma = _restrict(points[:, :3])
+        predictions, _ = _filter(y[rows], alpha, beta, gamma, points[:, 3], points[:, 4], points[:, 5:])
+        errors = y[rows] - predictions
+        # Row by row, as statsmodels reduces each location's errors
+        return np.array([error @ error for error in errors])
+
+    return np.array([result.x for result in _minimize_lockstep(sum_of_squares, starts, bounds)])
+
+
+def fit_batch(y, m=12, remove_bias=True):
+    """Fit additive Holt-Winters to every row of y (locations x months).
+
+    Returns (params, fitted, final_states) where params is a list of
+    statsmodels-style params dicts.
+    """
+    level, trend, seasons = _heuristic_init(y, m)
+    smoothing = _brute_search(y, level, trend, seasons)
+    solution = np.vstack([
+        _optimize(y[first:first + LOCKSTEP_BATCH], level[first:first + LOCKSTEP_BATCH],
+                  trend[first:first + LOCKSTEP_BATCH], seasons[first:first + LOCKSTEP_BATCH],
+                  smoothing[first:first + LOCKSTEP_BATCH])
+        for first in range(0, len(y), LOCKSTEP_BATCH)
+    ])
+    alpha, beta, gamma = _restrict(solution[:, :3])
+    level, trend, seasons = solution[:, 3], solution[:, 4], solution[:, 5:]
+
+    fitted, final_states = _filter(y, alpha, beta, gamma, level, trend, seasons)
+    params = [
+        {
+            'smoothing_level': float(alpha[i]),
+            'smoothing_trend': float(beta[i]),
+            'smoothing_seasonal': float(gamma[i]),
+            'damping_trend': np.nan,
+            'initial_level': float(level[i]),
+            'initial_trend': float(trend[i]),
+            'initial_seasons': seasons[i].copy(),
+            'use_boxcox': False,
+            'lamda': None,
+            'remove_bias': remove_bias,
+        }
+        for i in range(y.shape[0])
+    ]
+    return params, fitted, final_states
+
+
+def forecast_batch(y, fitted, final_states, steps, remove_bias=True):
+    """Forecast every row steps months past the end of the data"""
+    level, trend, seasons = final_states
+    m = seasons.shape[-1]
+    horizon = np.arange(1, steps + 1)
+    forecast = (level[:, None] + trend[:, None] * horizon
+                + seasons[:, (horizon - 1) % m])
+    if remove_bias:
+        # Same adjustment as statsmodels: shift by the mean in-sample error
+        forecast = forecast + (y - fitted).mean(axis=1)[:, None]
+    return forecast
+
+
+def forecast_interval_widths(y, fitted, alpha, beta, gamma, steps, m, level, remove_bias=True):
+    """Half-widths of the level prediction interval for every row and horizon.
+
+    In error-correction form each future error adds c_j = alpha * (1 + beta * j)
+    + gamma * [j % m == 0] to the j-step-ahead forecast, so the h-step variance
+    is sigma^2 * (1 + sum of c_j^2 for j < h), with sigma^2 the in-sample
+    one-step error variance.
+    """
+    residuals = y - fitted
+    if remove_bias:
+        residuals = residuals - residuals.mean(axis=1, keepdims=True)
+    sigma2 = (residuals ** 2).mean(axis=1)
+
+    j = np.arange(1, steps)
+    c = (alpha[:, None] * (1 + beta[:, None] * j)
+         + gamma[:, None] * (j % m == 0))
+    variance = sigma2[:, None] * (1 + np.concatenate([np.zeros((len(y), 1)), np.cumsum(c ** 2, axis=1)], axis=1))
+    z = NormalDist().inv_cdf((1 + level) / 2)
+    return z * np.sqrt(variance)
+
+
+def supports(config):
+    """Whether config is the undamped additive model this backend implements"""
+    return (config.get('model', 'holt_winters') == 'holt_winters'
+            and config['trend'] == 'add' and config['seasonal'] == 'add'
+            and not config.get('damped_trend', False) and not config['use_boxcox']
+            and config['initialization_method'] == 'estimated')
+
+
+def train_vectorized(series_by_location, config):
+    """Drop-in alternative to training.train_locations() for add/add models"""
+    if not supports(config):
+        raise ValueError("The vectorized backend only supports undamped additive trend and seasonality without Box-Cox, "
+                         "with estimated initial states")
+
+    m = config['seasonal_periods']
+    start = time.perf_counter()
+    models = {}
+    forecasts = {}
+    report = {'workers': 1, 'locations': {}, 'failed': []}
+
+    # Only series on the same date index can share one array
+    groups = {}
+    for location, location_series in series_by_location.items():
+        key = (location_series.index[0], len(location_series))
+        groups.setdefault(key, []).append(location)
+
+    for (first_date, length), locations in groups.items():
+        group_start = time.perf_counter()
+        y = np.vstack([series_by_location[location].to_numpy(dtype=float) for location in locations])
+        error = None
+        if length < 2 * m:
+            error = "ValueError: need at least two full seasonal cycles"
+        elif length < 10 + 2 * (m // 2):
+            error = f"ValueError: need at least {10 + 2 * (m // 2)} observations"
+        elif np.isnan(y).any():
+            error = "ValueError: series contains missing values"
+
+        if error is None:
+            params, fitted, final_states = fit_batch(y, m, config['remove_bias'])
+            forecast = forecast_batch(y, fitted, final_states, config['forecast_horizon'], config['remove_bias'])
+            alpha, beta, gamma = (np.array([p[name] for p in params]) for name in
+                                  ('smoothing_level', 'smoothing_trend', 'smoothing_seasonal'))
+            widths = forecast_interval_widths(y, fitted, alpha, beta, gamma, config['forecast_horizon'], m,
+                                              config['interval_level'], config['remove_bias'])
+            last_date = series_by_location[locations[0]].index[-1]
+            future_dates = pd.date_range(start=last_date + pd.DateOffset(months=1),
+                                         periods=config['forecast_horizon'], freq='ME')
+
+        per_location = (time.perf_counter() - group_start) / len(locations)
+        for i, location in enumerate(locations):
+            report['locations'][location] = {
+                'fit_seconds': round(per_location, 4),
+                'status': 'failed' if error else 'ok',
+                'error': error,
+                'warnings': [],
+            }
+            if error:
+                report['failed'].append(location)
+                continue
+            models[location] = params[i]
+            forecasts[location] = pd.DataFrame({
+                'Predicted Cases': forecast[i],
+                'Lower Bound': (forecast[i] - widths[i]).astype(np.float32),
+                'Upper Bound': (forecast[i] + widths[i]).astype(np.float32),
+            }, index=future_dates)
+
+    report['total_seconds'] = round(time.perf_counter() - start, 4)
+    return models, forecasts, report
@@ -0,0 +1,19 @@
+"""WSGI entry point for multi-worker production serving.
+
+Loading happens at import time, so with gunicorn's preload_app the data,
+models, forecasts and lookup index are built once in the master process
+and shared copy-on-write by every forked worker. The alert scheduler is
+started per worker after the fork (see gunicorn.conf.py); the scheduler
+lock file ensures only one of them actually runs the jobs.
+"""
+import gc
+
+import app as dengue_app
+
+dengue_app.load_data()
+
+# Move everything loaded so far out of the garbage collector's view, so
+# collections in the workers don't touch (and un-share) those pages
+gc.freeze()
+
+app = dengue_app.app
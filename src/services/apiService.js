@@ -27,6 +27,32 @@ export const predictCases = async (location, month, year) => {
   }
 };
 
+// Predict many locations/months at once. `query` takes either
+// { years, months } or { start: 'YYYY-MM', end: 'YYYY-MM' }, plus optional locations.
+// The response is columnar: predictions[i][j] is locations[i] in periods[j].
+export const predictCasesBatch = async (query) => {
+  try {
+    const response = await axios.post(`${API_BASE_URL}/predict/batch`, query);
+    return response.data;
+  } catch (error) {
+    console.error('Error predicting cases in batch:', error);
+    throw error;
+  }
+};
+
+// Per-location case totals, coordinates and risk level for a year
+export const getHeatmap = async (year) => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/heatmap`, {
+      params: { year }
+    });
+    return response.data.locations;
+  } catch (error) {
+    console.error('Error fetching heatmap data:', error);
+    throw error;
+  }
+};
+
 export const subscribe = async (userData) => {
   try {
     const response = await axios.post(`${API_BASE_URL}/subscribe`, userData);